@@ -11,28 +11,79 @@ def create_ticket(
     action: joft.models.CreateTicketAction,
     jira_session: jira.JIRA,
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
+        str,
+        typing.Union[
+            str, jira.Issue | str | typing.List[str], "joft.base.LazyReference"
+        ],
     ],
 ):
     joft.base.update_reference_pool(action.reference_data, reference_pool)
     joft.base.apply_reference_pool_to_payload(reference_pool, action.fields)
-    logging.debug(f"Creating new ticket of type: {action.fields['issuetype']['name']}")
-    logging.debug(f"Payload:\n{action.fields}")
+    logging.debug("Creating new ticket of type: %s", action.fields["issuetype"]["name"])
+    logging.debug("Payload:\n%s", action.fields)
 
     new_issue: jira.Issue = jira_session.create_issue(action.fields)
 
-    logging.info(f"New Jira ticket created: {new_issue.permalink()}")
+    logging.info("New Jira ticket created: %s", new_issue.permalink())
 
     if action.object_id:
         reference_pool[action.object_id] = new_issue
 
 
+def create_tickets(
+    actions: typing.List[joft.models.CreateTicketAction],
+    jira_session: jira.JIRA,
+    reference_pool: typing.Dict[
+        str,
+        typing.Union[
+            str, jira.Issue | str | typing.List[str], "joft.base.LazyReference"
+        ],
+    ],
+):
+    """Create the tickets of multiple create-ticket actions with one bulk request. The
+    actions can not reference each other as none of the tickets exists before the
+    request is sent."""
+
+    for action in actions:
+        joft.base.update_reference_pool(action.reference_data, reference_pool)
+        joft.base.apply_reference_pool_to_payload(reference_pool, action.fields)
+        logging.debug(
+            "Creating new ticket of type: %s", action.fields["issuetype"]["name"]
+        )
+        logging.debug("Payload:\n%s", action.fields)
+
+    # the created tickets are not fetched one by one after the bulk request, their
+    # fields are loaded only when a following action reuses them
+    results = jira_session.create_issues(
+        [action.fields for action in actions], prefetch=False
+    )
+
+    errors = []
+    for action, result in zip(actions, results):
+        if result["status"] != "Success":
+            errors.append(result["error"])
+            continue
+
+        new_issue: jira.Issue = result["issue"]
+
+        logging.info("New Jira ticket created: %s", new_issue.permalink())
+
+        if action.object_id:
+            reference_pool[action.object_id] = new_issue
+
+    if errors:
+        raise Exception(f"Failed to create {len(errors)} ticket(s): {errors}")
+
+
 # TODO jira_session is not needed here. Maybe remove?
 def update_ticket(
     action: joft.models.UpdateTicketAction,
     jira_session: jira.JIRA,
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
+        str,
+        typing.Union[
+            str, jira.Issue | str | typing.List[str], "joft.base.LazyReference"
+        ],
     ],
 ):
     joft.base.update_reference_pool(action.reference_data, reference_pool)
@@ -48,11 +99,16 @@ def update_ticket(
 
     ticket_to: jira.Issue = typing.cast(jira.Issue, reference_pool[action.reference_id])
 
-    logging.debug(f"Updating ticket '{ticket_to.key}'")
-    logging.debug(f"Payload:\n{action.fields}")
+    logging.debug("Updating ticket '%s'", ticket_to.key)
+    logging.debug("Payload:\n%s", action.fields)
     ticket_to.update(action.fields)
 
-    logging.info(f"Ticket '{ticket_to.key}' updated.")
+    # the values extracted from the ticket before the update are outdated
+    for key, value in reference_pool.items():
+        if isinstance(value, joft.base.LazyReference) and value.ref_object is ticket_to:
+            reference_pool[key] = joft.base.LazyReference(ticket_to, value.field)
+
+    logging.info("Ticket '%s' updated.", ticket_to.key)
 
     if action.object_id:
         reference_pool[action.object_id] = ticket_to
@@ -62,16 +118,19 @@ def link_issues(
     action: joft.models.LinkIssuesAction,
     jira_session: jira.JIRA,
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
+        str,
+        typing.Union[
+            str, jira.Issue | str | typing.List[str], "joft.base.LazyReference"
+        ],
     ],
 ):
     joft.base.update_reference_pool(action.reference_data, reference_pool)
     joft.base.apply_reference_pool_to_payload(reference_pool, action.fields)
 
     logging.info("Linking issues...")
-    logging.info(f"Link type: {action.fields['type']}")
-    logging.info(f"Linking From Issue: {action.fields['inward_issue']}")
-    logging.info(f"Linking To Issue: {action.fields['outward_issue']}")
+    logging.info("Link type: %s", action.fields["type"])
+    logging.info("Linking From Issue: %s", action.fields["inward_issue"])
+    logging.info("Linking To Issue: %s", action.fields["outward_issue"])
 
     jira_session.create_issue_link(
         action.fields["type"],
@@ -84,7 +143,10 @@ def transition_issue(
     action: joft.models.TransitionAction,
     jira_session: jira.JIRA,
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
+        str,
+        typing.Union[
+            str, jira.Issue | str | typing.List[str], "joft.base.LazyReference"
+        ],
     ],
 ):
     joft.base.update_reference_pool(action.reference_data, reference_pool)
@@ -100,11 +162,13 @@ def transition_issue(
 
     ticket_to: jira.Issue = typing.cast(jira.Issue, reference_pool[action.reference_id])
 
-    logging.info(f"Transitioning issue '{ticket_to.key}'...")
+    joft.base.load_issue_fields(ticket_to)
+
+    logging.info("Transitioning issue '%s'...", ticket_to.key)
     logging.info(
-        f"Changing status from '{ticket_to.fields.status}' to '{action.transition}'"
+        "Changing status from '%s' to '%s'", ticket_to.fields.status, action.transition
     )
-    logging.info(f"With comment: \n{action.comment}")
+    logging.info("With comment: \n%s", action.comment)
 
     jira_session.transition_issue(
         ticket_to, action.transition, action.fields, action.comment
@@ -112,3 +176,12 @@ def transition_issue(
 
     if action.object_id:
         reference_pool[action.object_id] = ticket_to
+
+
+# maps the action types used in the yaml templates to the functions executing them
+ACTION_HANDLERS: typing.Dict[str, typing.Callable[..., None]] = {
+    joft.models.CREATE_TICKET: create_ticket,
+    joft.models.UPDATE_TICKET: update_ticket,
+    joft.models.LINK_ISSUES: link_issues,
+    joft.models.TRANSITION: transition_issue,
+}
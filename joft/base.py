@@ -1,5 +1,9 @@
+import collections
+import concurrent.futures
 import copy
 import logging
+import os
+import re
 import typing
 
 import jira
@@ -12,7 +16,37 @@ import joft.models
 import joft.utils
 
 
+# number of trigger tickets processed concurrently, the work is dominated by waiting
+# on the jira REST API so threads are sufficient here
+DEFAULT_MAX_WORKERS = 5
+
+# jira accepts at most 50 issues in one bulk create request
+BULK_CREATE_SIZE = 50
+
+# matches a reference in a payload value, e.g. '${issue.key}' with 'issue.key' as group 1
+REFERENCE_RE = re.compile(r"\$\{([^}]+)\}")
+
+# the loaded templates are cached by the path, modification time and size of the
+# template file, so loading an unchanged template again is just a dict lookup
+TEMPLATE_CACHE_SIZE = 32
+template_cache: collections.OrderedDict[
+    typing.Tuple[str, int, int], joft.models.JiraTemplate
+] = collections.OrderedDict()
+
+
 def load_and_validate_template(template_file_path: str) -> joft.models.JiraTemplate:
+    try:
+        stat = os.stat(template_file_path)
+    except OSError:
+        # let the yaml loader report the problem with the file
+        cache_key = None
+    else:
+        cache_key = (template_file_path, stat.st_mtime_ns, stat.st_size)
+
+    if cache_key and cache_key in template_cache:
+        template_cache.move_to_end(cache_key)
+        return template_cache[cache_key]
+
     template: typing.Dict[str, typing.Any] = joft.utils.load_and_parse_yaml_file(
         template_file_path
     )
@@ -24,30 +58,112 @@ def load_and_validate_template(template_file_path: str) -> joft.models.JiraTempl
     # their results (a ticket or a results of a search)
     validate_uniqueness_of_object_ids(jira_template)
 
+    if cache_key:
+        template_cache[cache_key] = jira_template
+        if len(template_cache) > TEMPLATE_CACHE_SIZE:
+            template_cache.popitem(last=False)
+
     return jira_template
 
 
-def search_issues(jira_template: joft.models.JiraTemplate, jira_session: jira.JIRA):
+def search_fields(jira_template: joft.models.JiraTemplate) -> typing.List[str]:
+    """Return the fields of the trigger tickets which are used by the actions. Only
+    these fields are requested from Jira when searching for the trigger tickets."""
+
+    # the id and the key are always present in the response
+    fields = {"key"}
+
+    if not jira_template.jira_search:
+        return sorted(fields)
+
+    # update-ticket and transition actions with an object_id put the ticket they
+    # reference into the reference pool under another id. Jira doesn't reload the
+    # ticket after a transition, so the fields referenced through these aliases have to
+    # be fetched by the search as well
+    trigger_ids = {jira_template.jira_search.object_id}
+
+    for action in jira_template.jira_actions:
+        reference_id = None
+        if action.type in (joft.models.UPDATE_TICKET, joft.models.TRANSITION):
+            reference_id = typing.cast(
+                joft.models.UpdateTicketAction | joft.models.TransitionAction, action
+            ).reference_id
+
+        # transition logs the current status of the ticket
+        if action.type == joft.models.TRANSITION and reference_id in trigger_ids:
+            fields.add("status")
+
+        for ref in action.reference_data:
+            if ref.reference_id not in trigger_ids:
+                continue
+
+            # the permalink is built from the key, all the other reusable fields have
+            # the same name as the jira field they are extracted from
+            fields.update(
+                field
+                for field in ref.fields
+                if field not in ("id", "key", "link", "url", "permalink")
+            )
+
+        if reference_id in trigger_ids and action.object_id:
+            trigger_ids.add(action.object_id)
+
+    return sorted(fields)
+
+
+def search_issues(
+    jira_template: joft.models.JiraTemplate,
+    jira_session: jira.JIRA,
+    fields: typing.List[str] | None = None,
+) -> typing.List[jira.Issue]:
+    if not jira_template.jira_search:
+        raise Exception("The template has no trigger to search the issues with!")
+
+    if fields is None:
+        fields = search_fields(jira_template)
+
+    # the search is network bound, so we request bigger pages than the default 50
+    # issues to reduce the number of round-trips to jira. The client fetches all the
+    # pages by itself, Jira Server/Data Center is searched with the page size from the
+    # options of the session, which is lowered with a warning when jira allows only
+    # smaller pages. Jira Cloud is searched with its own token based paging.
+    batch_sizes = jira_session._options["default_batch_size"]
+    batch_sizes[jira.resources.Issue] = jira_template.jira_search.batch_size
+
+    # the client replaces the field names in the given list by their ids
     return typing.cast(
         jira.client.ResultList[jira.Issue],
-        jira_session.search_issues(jira_template.jira_search.jql),
+        jira_session.search_issues(
+            jira_template.jira_search.jql, maxResults=False, fields=list(fields)
+        ),
     )
 
 
 def list_issues(template_file_path: str, jira_session: jira.JIRA):
     jira_template = load_and_validate_template(template_file_path)
 
-    trigger_result = search_issues(jira_template, jira_session)
+    # the listing needs only the key of the issues
+    trigger_result = search_issues(jira_template, jira_session, fields=["key"])
 
     if not trigger_result:
         return "No issues found."
 
-    table_result = [[issue.key, issue.permalink()] for issue in trigger_result]
+    # the url of the issue is the same as its permalink, just without building it
+    # from the options of each issue
+    browse_url = f"{jira_session.server_url.rstrip('/')}/browse"
+    table_result = [
+        (issue.key, f"{browse_url}/{issue.key}") for issue in trigger_result
+    ]
 
-    return tabulate.tabulate(table_result, ["Key", "URL"])
+    # the keys and urls are never numbers
+    return tabulate.tabulate(table_result, ["Key", "URL"], disable_numparse=True)
 
 
-def execute_template(template_file_path: str, jira_session: jira.JIRA) -> int:
+def execute_template(
+    template_file_path: str,
+    jira_session: jira.JIRA,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> int:
     """Function which starts the whole process of jira template execution"""
 
     jira_template = load_and_validate_template(template_file_path)
@@ -60,16 +176,16 @@ def execute_template(template_file_path: str, jira_session: jira.JIRA) -> int:
 
         if not trigger_result:
             logging.info(
-                (
-                    "No tickets found according to the provided jira query "
-                    f"'{jira_template.jira_search.jql}'!"
-                )
+                "No tickets found according to the provided jira query '%s'!",
+                jira_template.jira_search.jql,
             )
             return 0
 
         # when the jira query is successfull the actions of template will be then executed
         # for each ticket in the query
-        execute_actions_per_trigger_ticket(trigger_result, jira_template, jira_session)
+        execute_actions_per_trigger_ticket(
+            trigger_result, jira_template, jira_session, max_workers
+        )
         return 0
 
     # if there is no trigger defined the actions are executed once
@@ -77,50 +193,117 @@ def execute_template(template_file_path: str, jira_session: jira.JIRA) -> int:
     return 0
 
 
+def group_actions(
+    actions: typing.List[joft.models.JiraAction],
+) -> typing.List[typing.List[joft.models.JiraAction]]:
+    """Split the actions into groups which are executed together. Consecutive
+    create-ticket actions end up in one group, so they can be created by a single bulk
+    request, as long as they don't reference a ticket created in the same group and the
+    group is not bigger than BULK_CREATE_SIZE. All the other actions are executed one
+    by one."""
+
+    groups: typing.List[typing.List[joft.models.JiraAction]] = []
+    group_object_ids: typing.Set[str] = set()
+
+    for action in actions:
+        if (
+            action.type == joft.models.CREATE_TICKET
+            and groups
+            and groups[-1][0].type == joft.models.CREATE_TICKET
+            and len(groups[-1]) < BULK_CREATE_SIZE
+            and not any(
+                ref.reference_id in group_object_ids for ref in action.reference_data
+            )
+        ):
+            groups[-1].append(action)
+        else:
+            groups.append([action])
+            group_object_ids = set()
+
+        if action.object_id:
+            group_object_ids.add(action.object_id)
+
+    return groups
+
+
+def snapshot_actions(
+    jira_template: joft.models.JiraTemplate,
+) -> typing.List[typing.List[joft.models.JiraAction]]:
+    """Return the grouped actions of the template with compiled payloads, so the runs
+    of the actions don't need to search the payloads for references again."""
+
+    groups = []
+    for group in group_actions(jira_template.jira_actions):
+        # the template itself is left untouched
+        groups.append([copy_action(action, compile_payload) for action in group])
+
+    return groups
+
+
+def copy_action(
+    action: joft.models.JiraAction,
+    copy_fields: typing.Callable[[typing.Any], typing.Any] = dict,
+) -> joft.models.JiraAction:
+    """Return a copy of the action with a copy of its payload. The payload is the only
+    part of an action changed by its execution and applying the reference pool only
+    replaces its top level values, so a shallow copy of the payload is sufficient."""
+
+    action_copy = copy.copy(action)
+    action_copy.fields = copy_fields(action.fields)
+
+    return action_copy
+
+
 def execute_actions(
     jira_template: joft.models.JiraTemplate,
     jira_session: jira.JIRA,
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
-    ] = {},
+        str, typing.Union[str, jira.Issue | str | typing.List[str], "LazyReference"]
+    ]
+    | None = None,
+    actions_snapshot: typing.List[typing.List[joft.models.JiraAction]] | None = None,
 ) -> None:
-    for action in jira_template.jira_actions:
-        # we deep copy each action from the template
-        # each run of all the actions needs each action to retain its references
-        # the references are replaced and filled in when the action is executed
-        match action.type:
-            case "create-ticket":
-                joft.actions.create_ticket(
-                    typing.cast(joft.models.CreateTicketAction, copy.deepcopy(action)),
-                    jira_session,
-                    reference_pool,
-                )
-            case "update-ticket":
-                joft.actions.update_ticket(
-                    typing.cast(joft.models.UpdateTicketAction, copy.deepcopy(action)),
-                    jira_session,
-                    reference_pool,
-                )
-            case "link-issues":
-                joft.actions.link_issues(
-                    typing.cast(joft.models.LinkIssuesAction, copy.deepcopy(action)),
-                    jira_session,
-                    reference_pool,
-                )
-            case "transition":
-                joft.actions.transition_issue(
-                    typing.cast(joft.models.TransitionAction, copy.deepcopy(action)),
-                    jira_session,
-                    reference_pool,
-                )
+    # each run of the actions starts with its own reference pool
+    if reference_pool is None:
+        reference_pool = {}
+
+    if actions_snapshot is None:
+        actions_snapshot = snapshot_actions(jira_template)
+
+    # each run of all the actions needs each action to retain its references
+    # the references are replaced and filled in when the action is executed, so we
+    # work on a fresh copy of the actions from the snapshot
+    groups = [[copy_action(action) for action in group] for group in actions_snapshot]
+
+    for group in groups:
+        if len(group) > 1:
+            joft.actions.create_tickets(
+                typing.cast(typing.List[joft.models.CreateTicketAction], group),
+                jira_session,
+                reference_pool,
+            )
+            continue
+
+        action = group[0]
+        handler = joft.actions.ACTION_HANDLERS.get(action.type)
+        if handler is None:
+            logging.warning("Unknown action '%s'! Skipping...", action.type)
+            continue
+
+        handler(action, jira_session, reference_pool)
 
 
 def execute_actions_per_trigger_ticket(
     trigger_result: typing.List[jira.Issue],
     jira_template: joft.models.JiraTemplate,
     jira_session: jira.JIRA,
+    max_workers: int = DEFAULT_MAX_WORKERS,
 ) -> None:
-    """Function which executes the action for each ticket found in a trigger query."""
+    """Function which executes the action for each ticket found in a trigger query.
+    The tickets are processed concurrently by a pool of max_workers threads. The
+    processing stops at the first failure, every failed ticket is logged and the
+    exception of the first failed ticket in the order of the trigger result is
+    raised."""
 
     # reference_pool holds information about data which was referenced by object ids in the
     # current run.
@@ -128,15 +311,60 @@ def execute_actions_per_trigger_ticket(
     # A action object_id references the result of an action. For example the result
     # of a create-ticket action is the created ticket.
     # The reference pool should be shared between all actions so they can reference data
-    # from it through 'reuse-data' sections and reuse the data from the referenced objects
-    reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
-    ] = {}
+    # from it through 'reuse-data' sections and reuse the data from the referenced objects.
+    # Each ticket gets its own reference pool so the concurrent runs do not share any state.
+    actions_snapshot = snapshot_actions(jira_template)
+    trigger = typing.cast(joft.models.Trigger, jira_template.jira_search)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            futures = {
+                executor.submit(
+                    execute_actions,
+                    jira_template,
+                    jira_session,
+                    {trigger.object_id: ticket},
+                    actions_snapshot,
+                ): ticket
+                for ticket in trigger_result
+            }
+
+            _, not_done = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_EXCEPTION
+            )
+        except BaseException:
+            # e.g. Ctrl-C, the tickets still waiting in the queue must not be sent to
+            # jira while the ones already being processed are finished
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        # stop at the first failure, the tickets which are already being processed
+        # are finished, the ones still waiting in the queue are not processed at all
+        if not_done:
+            executor.shutdown(cancel_futures=True)
+
+    failures = [
+        (futures[future], future.exception())
+        for future in futures
+        if not future.cancelled() and future.exception()
+    ]
+    if not failures:
+        return
+
+    for ticket, exc in failures:
+        logging.error(
+            "Executing the actions for ticket '%s' failed: %s", ticket.key, exc
+        )
 
-    for ticket in trigger_result:
-        reference_pool[jira_template.jira_search.object_id] = ticket
-        execute_actions(jira_template, jira_session, reference_pool)
-        reference_pool = {}
+    cancelled = sum(future.cancelled() for future in futures)
+    if cancelled:
+        logging.error(
+            "%s ticket(s) were not processed because of the failure.", cancelled
+        )
+
+    # re-raise the exception of the first failed ticket in the order of the trigger
+    # result, which is not necessarily the first failure in time
+    raise typing.cast(BaseException, failures[0][1])
 
 
 def validate_uniqueness_of_object_ids(jira_template: joft.models.JiraTemplate) -> None:
@@ -151,34 +379,38 @@ def validate_uniqueness_of_object_ids(jira_template: joft.models.JiraTemplate) -
         if action.object_id:
             object_ids.append(action.object_id)
 
-    # check if all the object ids are unique
-    if len(object_ids) != len(set(object_ids)):
-        duplicate_id: str = max(object_ids, key=object_ids.count)
-        err_msg = (
-            "The validation of the property 'object_id' has failed. "
-            f"The object_id with the value '{duplicate_id}' has been "
-            "defined as the 'object_id' for 2 or more objects!"
-        )
-        raise Exception(err_msg)
+    # check if all the object ids are unique, we stop at the first duplicate
+    seen_object_ids: typing.Set[str] = set()
+    for object_id in object_ids:
+        if object_id in seen_object_ids:
+            err_msg = (
+                "The validation of the property 'object_id' has failed. "
+                f"The object_id with the value '{object_id}' has been "
+                "defined as the 'object_id' for 2 or more objects!"
+            )
+            raise Exception(err_msg)
+
+        seen_object_ids.add(object_id)
 
 
 def validate_template(template_file_path: str) -> int:
-    template: typing.Dict[str, typing.Any] = joft.utils.load_and_parse_yaml_file(
-        template_file_path
-    )
-    jira_template = joft.models.JiraTemplate(**template)
-    validate_uniqueness_of_object_ids(jira_template)
+    # the validated template is cached, so running it afterwards doesn't load it again
+    load_and_validate_template(template_file_path)
     return 0
 
 
 def update_reference_pool(
     reference_data: typing.List[joft.models.ReferenceData],
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue, typing.List[typing.Any]]
+        str,
+        typing.Union[str, jira.Issue, typing.List[typing.Any], "LazyReference"],
     ],
 ):
     """We update the reference_pool with the references from the reuse_data section"""
 
+    if not reference_data:
+        return
+
     for ref in reference_data:
         if ref.reference_id not in reference_pool:
             raise Exception(
@@ -187,41 +419,107 @@ def update_reference_pool(
 
         ref_object = typing.cast(jira.Issue, reference_pool[ref.reference_id])
 
-        # different fields have a different location in the jira issue object
-        # we need to appropriate this when extracting the values
+        # the values are extracted only when an action actually uses them. A value
+        # already referenced by a previous action of the same run keeps its extracted
+        # value, unless the reference now points to a different object
         for field in ref.fields:
-            match field:
-                case "id" | "key":
-                    reference_pool[f"{ref.reference_id}.{field}"] = getattr(
-                        ref_object, field
-                    )
-                case "link" | "url" | "permalink":
-                    reference_pool[f"{ref.reference_id}.{field}"] = (
-                        ref_object.permalink()
-                    )
-                case "priority":
-                    reference_pool[f"{ref.reference_id}.{field}"] = (
-                        ref_object.fields.priority.name
-                    )
-                case "components":
-                    reference_pool[f"{ref.reference_id}.{field}"] = []
-                    for component in ref_object.fields.components:
-                        typing.cast(
-                            list, reference_pool[f"{ref.reference_id}.{field}"]
-                        ).append({"name": component.name})
-                case "project":
-                    reference_pool[f"{ref.reference_id}.{field}"] = getattr(
-                        ref_object.fields.project, "key"
-                    )
-                case _:
-                    reference_pool[f"{ref.reference_id}.{field}"] = getattr(
-                        ref_object.fields, field
-                    )
+            key = f"{ref.reference_id}.{field}"
+            value = reference_pool.get(key)
+            if isinstance(value, LazyReference) and value.ref_object is ref_object:
+                continue
+
+            reference_pool[key] = LazyReference(ref_object, field)
+
+
+class LazyReference:
+    """A field of a referenced object which is extracted on the first access of its
+    value. The extracted value is kept for the following accesses."""
+
+    __slots__ = ("ref_object", "field", "_value", "_extracted")
+
+    def __init__(self, ref_object: jira.Issue, field: str) -> None:
+        self.ref_object = ref_object
+        self.field = field
+        self._value: typing.Any = None
+        self._extracted = False
+
+    @property
+    def value(self) -> typing.Any:
+        if not self._extracted:
+            self._value = extract_reference_field(self.ref_object, self.field)
+            self._extracted = True
+
+        return self._value
+
+
+def load_issue_fields(issue: jira.Issue) -> jira.Issue:
+    """Load the fields of a ticket created by a bulk request, which holds only its id
+    and key. The fields are requested from jira only when an action uses them."""
+
+    if not hasattr(issue, "fields"):
+        issue.find(issue.key)
+
+    return issue
+
+
+def extract_reference_field(ref_object: jira.Issue, field: str) -> typing.Any:
+    """Extract the value of a field from a referenced object"""
+
+    # the id, the key and the permalink are known without the other fields
+    if field not in ("id", "key", "link", "url", "permalink"):
+        load_issue_fields(ref_object)
+
+    # different fields have a different location in the jira issue object
+    # we need to appropriate this when extracting the values
+    match field:
+        case "id" | "key":
+            return getattr(ref_object, field)
+        case "link" | "url" | "permalink":
+            return ref_object.permalink()
+        case "priority":
+            return ref_object.fields.priority.name
+        case "components":
+            return [
+                {"name": component.name} for component in ref_object.fields.components
+            ]
+        case "project":
+            return getattr(ref_object.fields.project, "key")
+        case _:
+            return getattr(ref_object.fields, field)
+
+
+class FieldTemplate(str):
+    """A payload value with references, which keeps the value split by REFERENCE_RE.
+    The even items of parts are the literal text, the odd items are the references
+    between them. The template itself is the original value, so a payload which is
+    never rendered still holds the original values."""
+
+    parts: typing.Tuple[str, ...]
+
+    def __new__(cls, value: str) -> "FieldTemplate":
+        template = super().__new__(cls, value)
+        template.parts = tuple(REFERENCE_RE.split(value))
+        return template
+
+
+def compile_payload(value: typing.Any) -> typing.Any:
+    """Return a copy of the payload with the values containing references replaced by
+    FieldTemplates"""
+
+    if isinstance(value, str):
+        if "$" in value and REFERENCE_RE.search(value):
+            return FieldTemplate(value)
+        return value
+    if isinstance(value, dict):
+        return {k: compile_payload(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [compile_payload(v) for v in value]
+    return value
 
 
 def apply_reference_pool_to_payload(
     reference_pool: typing.Dict[
-        str, typing.Union[str, jira.Issue | str | typing.List[str]]
+        str, typing.Union[str, jira.Issue | str | typing.List[str], "LazyReference"]
     ],
     fields: typing.Any,
 ) -> None:
@@ -231,49 +529,48 @@ def apply_reference_pool_to_payload(
     replaced by the value which is referenced by the same reference in the reference_pool
     """
 
-    for field in fields:
-        for ref, v in reference_pool.items():
-            # TODO: write tests about replacing values and refactor this
-            if not isinstance(v, (str, list)):
-                continue
+    # there is nothing to replace the references with
+    if not reference_pool:
+        return
+
+    def lookup(ref: str) -> typing.Any:
+        value = reference_pool.get(ref)
+        if isinstance(value, LazyReference):
+            return value.value
+        return value
+
+    def substitute(ref: str) -> str:
+        value = lookup(ref)
+        # only text can be substituted, everything else is left as it is
+        return value if isinstance(value, str) else f"${{{ref}}}"
+
+    def render(parts: typing.Sequence[str]) -> typing.Any:
+        # a value which is just a reference to a list is replaced by the whole list,
+        # e.g. 'components: "${issue.components}"'
+        if len(parts) == 3 and not parts[0] and not parts[2]:
+            value = lookup(parts[1])
+            if isinstance(value, list):
+                return value
+
+        # there can be multiple references in one value
+        return "".join(
+            part if i % 2 == 0 else substitute(part) for i, part in enumerate(parts)
+        )
 
-            if type(v) is list:
-                if field == "components":
-                    if f"${{{ref}}}" in fields[field]:
-                        fields[field] = v
-                        continue
-
-            if type(v) is str:
-                # there can be multiple references in one field
-                if field == "project":
-                    if "key" in fields[field]:
-                        fields[field]["key"] = replace_ref(fields[field]["key"], ref, v)
-                    elif "name" in fields[field]:
-                        fields[field]["name"] = replace_ref(
-                            fields[field]["name"], ref, v
-                        )
-                    continue
-                if field == "issuetype":
-                    fields[field]["name"] = replace_ref(fields[field]["name"], ref, v)
-                    continue
-                if field == "assignee":
-                    fields[field]["name"] = replace_ref(fields[field]["name"], ref, v)
-                    continue
-                if field == "priority":
-                    fields[field]["name"] = replace_ref(fields[field]["name"], ref, v)
-                    continue
-                if field == "labels":
-                    fields[field] = list(
-                        map(
-                            lambda label: replace_ref(label, ref, typing.cast(str, v)),
-                            fields[field],
-                        )
-                    )
-                    continue
-
-                if ref in fields[field]:
-                    fields[field] = replace_ref(fields[field], ref, v)
-
-
-def replace_ref(field: str, ref: str, value: str) -> str:
-    return field.replace("${" + ref + "}", value)
+    def expand(value: typing.Any) -> typing.Any:
+        if isinstance(value, FieldTemplate):
+            return render(value.parts)
+        if isinstance(value, str):
+            # most of the values don't contain any reference at all
+            if "$" not in value:
+                return value
+
+            return render(REFERENCE_RE.split(value))
+        if isinstance(value, dict):
+            return {k: expand(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [expand(v) for v in value]
+        return value
+
+    for field, value in fields.items():
+        fields[field] = expand(value)
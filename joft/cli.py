@@ -4,6 +4,7 @@ import sys
 
 import click
 import jira
+import requests.adapters
 
 import joft.base
 import joft.utils
@@ -15,6 +16,57 @@ else:
     logging_level = logging.WARNING
 
 
+# click checks that the template file exists before any command touches it
+template_option = click.option(
+    "--template",
+    type=click.Path(exists=True, dir_okay=False),
+    required=True,
+    help="File path to the template file.",
+)
+
+
+def read_max_workers() -> int:
+    """Return the number of concurrently processed trigger tickets set by the
+    JOFT_MAX_WORKERS environment variable."""
+
+    value = os.getenv("JOFT_MAX_WORKERS")
+    if value is None:
+        return joft.base.DEFAULT_MAX_WORKERS
+
+    try:
+        max_workers = int(value)
+    except ValueError:
+        max_workers = 0
+
+    if max_workers < 1:
+        raise click.UsageError(
+            f"JOFT_MAX_WORKERS must be a positive integer, not '{value}'."
+        )
+
+    return max_workers
+
+
+def create_jira_session(
+    config: dict, max_workers: int = joft.base.DEFAULT_MAX_WORKERS
+) -> jira.JIRA:
+    jira_session = jira.JIRA(
+        config["jira"]["server"]["hostname"],
+        token_auth=config["jira"]["server"]["pat_token"],
+    )
+
+    # the session keeps up to requests.adapters.DEFAULT_POOLSIZE open connections to
+    # the jira host. Each worker processing a trigger ticket needs its own connection,
+    # so the pool is made bigger only when there are more workers, otherwise the
+    # connections above the limit are discarded after each request. The retries of
+    # failed requests are left to the ResilientSession of the jira client.
+    if max_workers > requests.adapters.DEFAULT_POOLSIZE:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        jira_session._session.mount("https://", adapter)
+        jira_session._session.mount("http://", adapter)
+
+    return jira_session
+
+
 @click.group()
 @click.pass_context
 def main(ctx) -> None:
@@ -23,47 +75,46 @@ def main(ctx) -> None:
 
 # TODO: refactor th CLI interface so it makes more sense
 @main.command(name="validate")
-@click.option("--template", help="File path to the template file.")
+@template_option
 def validate(template) -> int:
     ret_code = joft.base.validate_template(template)
     sys.exit(ret_code)
 
 
 @main.command(name="run")
-@click.option("--template", help="File path to the template file.")
+@template_option
 @click.pass_obj
 def run(ctx, template: str) -> int:
+    # checked before anything is sent to jira
+    max_workers = read_max_workers()
+
     logging.basicConfig(format="%(levelname)s:%(message)s", level=logging_level)
     logging.info(
-        f"Establishing session with jira server: {ctx['jira']['server']['hostname']}:"
+        "Establishing session with jira server: %s:", ctx["jira"]["server"]["hostname"]
     )
 
-    jira_session = jira.JIRA(
-        ctx["jira"]["server"]["hostname"], token_auth=ctx["jira"]["server"]["pat_token"]
-    )
+    jira_session = create_jira_session(ctx, max_workers)
 
     logging.info("Session established...")
-    logging.info(f"Executing Jira template: {template}")
+    logging.info("Executing Jira template: %s", template)
 
-    ret_code = joft.base.execute_template(template, jira_session)
+    ret_code = joft.base.execute_template(template, jira_session, max_workers)
 
     sys.exit(ret_code)
 
 
 @main.command(name="list-issues")
-@click.option("--template", help="File path to the template file.")
+@template_option
 @click.pass_obj
 def list_issues(ctx, template: str) -> None:
     logging.basicConfig(format="%(levelname)s:%(message)s", level=logging_level)
     logging.info(
-        f"Establishing session with jira server: {ctx['jira']['server']['hostname']}:"
+        "Establishing session with jira server: %s:", ctx["jira"]["server"]["hostname"]
     )
 
-    jira_session = jira.JIRA(
-        ctx["jira"]["server"]["hostname"], token_auth=ctx["jira"]["server"]["pat_token"]
-    )
+    jira_session = create_jira_session(ctx)
 
     logging.info("Session established...")
-    logging.info(f"Executing trigger from Jira template: {template}")
+    logging.info("Executing trigger from Jira template: %s", template)
 
     print(joft.base.list_issues(template, jira_session))
@@ -1,39 +1,42 @@
 import dataclasses
 import typing
 
+# the action types as they are written in the templates
+CREATE_TICKET: typing.Final = "create-ticket"
+UPDATE_TICKET: typing.Final = "update-ticket"
+LINK_ISSUES: typing.Final = "link-issues"
+TRANSITION: typing.Final = "transition"
 
-@dataclasses.dataclass
+
+# the trigger and the references are shared by all the runs of a cached template, so
+# they can't be changed once they are loaded
+@dataclasses.dataclass(slots=True, frozen=True)
 class Trigger:
     type: str
     object_id: str
     jql: str
+    # number of issues requested from jira per page of the search results
+    batch_size: int = 500
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ReferenceData:
     reference_id: str
-    fields: list[str]
+    fields: typing.Sequence[str]
+
+    def __post_init__(self):
+        # the fields are loaded as a list from the yaml template, a tuple keeps them
+        # from being changed together with the rest of the frozen reference
+        object.__setattr__(self, "fields", tuple(self.fields))
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class Action:
     # required fields
     type: str
     fields: typing.Dict[str, typing.Any]
 
-    def reuse_data_must_be_list(self, reuse_data):
-        reuse_data_type = type(reuse_data)
-
-        if reuse_data_type is not list:
-            raise Exception(
-                f"Reuse data is a '{reuse_data_type}' type, must be a list."
-            )
-
-
-@dataclasses.dataclass(kw_only=True)
-class CreateTicketAction(Action):
     reuse_data: dataclasses.InitVar[typing.List[ReferenceData] | None] = None
-    object_id: str | None = None
 
     reference_data: typing.List[ReferenceData] = dataclasses.field(default_factory=list)
 
@@ -41,60 +44,52 @@ class CreateTicketAction(Action):
         if reuse_data:
             self.reuse_data_must_be_list(reuse_data)
 
-            for data in reuse_data:
-                self.reference_data.append(ReferenceData(**data))
+            self.reference_data = [ReferenceData(**data) for data in reuse_data]
+
+    def reuse_data_must_be_list(self, reuse_data):
+        if not isinstance(reuse_data, list):
+            raise TypeError(
+                f"Reuse data is a '{type(reuse_data).__name__}' type, must be a list."
+            )
 
 
-@dataclasses.dataclass(kw_only=True)
-class UpdateTicketAction(Action):
-    reference_id: str
+@dataclasses.dataclass(kw_only=True, slots=True)
+class CreateTicketAction(Action):
     object_id: str | None = None
-    reuse_data: dataclasses.InitVar[typing.List[ReferenceData] | None] = None
 
-    reference_data: typing.List[ReferenceData] = dataclasses.field(default_factory=list)
 
-    def __post_init__(self, reuse_data):
-        if reuse_data:
-            self.reuse_data_must_be_list(reuse_data)
-
-            for data in reuse_data:
-                self.reference_data.append(ReferenceData(**data))
+@dataclasses.dataclass(kw_only=True, slots=True)
+class UpdateTicketAction(Action):
+    reference_id: str
+    object_id: str | None = None
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class LinkIssuesAction(Action):
-    reuse_data: dataclasses.InitVar[typing.List[ReferenceData] | None] = None
     object_id: str | None = None
 
-    reference_data: typing.List[ReferenceData] = dataclasses.field(default_factory=list)
-
-    def __post_init__(self, reuse_data):
-        if reuse_data:
-            self.reuse_data_must_be_list(reuse_data)
 
-            for data in reuse_data:
-                self.reference_data.append(ReferenceData(**data))
-
-
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class TransitionAction(Action):
     reference_id: str
     transition: str
     comment: str
     object_id: str | None = None
-    reuse_data: dataclasses.InitVar[typing.List[ReferenceData] | None] = None
 
-    reference_data: typing.List[ReferenceData] = dataclasses.field(default_factory=list)
 
-    def __post_init__(self, reuse_data):
-        if reuse_data:
-            self.reuse_data_must_be_list(reuse_data)
+JiraAction = (
+    CreateTicketAction | UpdateTicketAction | LinkIssuesAction | TransitionAction
+)
 
-            for data in reuse_data:
-                self.reference_data.append(ReferenceData(**data))
+ACTION_TYPES: typing.Dict[str, typing.Callable[..., JiraAction]] = {
+    CREATE_TICKET: CreateTicketAction,
+    UPDATE_TICKET: UpdateTicketAction,
+    LINK_ISSUES: LinkIssuesAction,
+    TRANSITION: TransitionAction,
+}
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class JiraTemplate:
     api_version: int
     kind: str
@@ -104,26 +99,21 @@ class JiraTemplate:
     trigger: dataclasses.InitVar[Trigger]
 
     # with default values procesed in __post_init__
-    jira_actions: list[
-        CreateTicketAction | UpdateTicketAction | LinkIssuesAction | TransitionAction
-    ] = dataclasses.field(default_factory=list)
+    jira_actions: list[JiraAction] = dataclasses.field(default_factory=list)
 
     metadata: typing.Dict[str, str] | None = None
 
+    jira_search: Trigger | None = dataclasses.field(default=None, init=False)
+
     def __post_init__(self, actions, trigger) -> None:
         if trigger:
-            self.jira_search: Trigger = Trigger(**trigger)
+            self.jira_search = Trigger(**trigger)
 
         # TODO: all init vars need to be checked for correct types and raise if it is not so.
         for action in actions:
-            match action["type"]:
-                case "create-ticket":
-                    self.jira_actions.append(CreateTicketAction(**action))
-                case "update-ticket":
-                    self.jira_actions.append(UpdateTicketAction(**action))
-                case "link-issues":
-                    self.jira_actions.append(LinkIssuesAction(**action))
-                case "transition":
-                    self.jira_actions.append(TransitionAction(**action))
-                case _:
-                    raise Exception(f"Unknown Action '{action['type']}'! Aborting...")
+            if action["type"] not in ACTION_TYPES:
+                raise Exception(f"Unknown Action '{action['type']}'! Aborting...")
+
+        self.jira_actions = [
+            ACTION_TYPES[action["type"]](**action) for action in actions
+        ]
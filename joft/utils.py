@@ -1,3 +1,5 @@
+import functools
+import os
 import pathlib
 import textwrap
 import typing
@@ -8,9 +10,46 @@ import platformdirs
 import yaml
 
 
+# name of the configuration file searched for in the config directories
+CONFIG_FILE_NAME = "joft.config.toml"
+
+# the error messages are dedented only once, they are filled in when the configuration
+# can't be loaded
+INVALID_CONFIG_MSG = textwrap.dedent("""\
+    [ERROR] Configuration file {path} is invalid:
+
+    {error_type} - {error}
+
+    Configuration file should have the following content:
+
+    [jira.server]
+    hostname = "<your jira server url>"
+    pat_token = "<your jira pat token>"
+
+    and should be stored in one of the following directories:
+    {paths}""")
+
+MISSING_CONFIG_MSG = textwrap.dedent("""\
+    [ERROR] Cannot find configuration file '{file_name}'.
+
+    Create the file with the following content:
+
+    [jira.server]
+    hostname = "<your jira server url>"
+    pat_token = "<your jira pat token>"
+
+    in one of the following directories:
+    {paths}""")
+
+# the libyaml based loader is much faster than the pure python one, but pyyaml can be
+# installed without libyaml
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def load_and_parse_yaml_file(path: str) -> typing.Dict[str, typing.Any]:
-    with open(path) as fp:
-        yaml_obj = yaml.safe_load(fp)
+    # libyaml reads and decodes the bytes by itself
+    with open(path, "rb") as fp:
+        yaml_obj = yaml.load(fp, Loader=YamlLoader)
 
     return yaml_obj
 
@@ -22,57 +61,52 @@ def read_and_validate_config(
     with open(path, "rb") as fp:
         config = tomllib.load(fp)
 
-    config["jira"]["server"]["hostname"]
-    config["jira"]["server"]["pat_token"]
+    jira_server = config.get("jira", {}).get("server", {})
+    missing_keys = {"hostname", "pat_token"} - jira_server.keys()
+    if missing_keys:
+        raise KeyError(", ".join(sorted(missing_keys)))
 
     return config
 
 
+# the configuration doesn't change while joft is running, so it is looked up and read
+# only once. When no valid configuration is found the function exits, so nothing is
+# cached then.
+@functools.cache
 def load_toml_app_config() -> typing.Any:
-    possible_paths = []
-
-    possible_paths.append(str(pathlib.Path.cwd()))
-    possible_paths.append(platformdirs.user_config_dir())
-    possible_paths.extend(platformdirs.site_config_dir(multipath=True).split(":"))
-    possible_paths.append("/etc")
+    # the directories often overlap (e.g. /etc is one of the site config dirs), each of
+    # them is checked only once while the order of their priority is kept
+    possible_paths = list(
+        dict.fromkeys(
+            [
+                str(pathlib.Path.cwd()),
+                platformdirs.user_config_dir(),
+                *platformdirs.site_config_dir(multipath=True).split(":"),
+                "/etc",
+            ]
+        )
+    )
 
     for path in possible_paths:
-        config_file_path = pathlib.Path(path) / "joft.config.toml"
-        if config_file_path.is_file():
+        config_file_path = os.path.join(path, CONFIG_FILE_NAME)
+        if os.path.isfile(config_file_path):
             try:
                 config = read_and_validate_config(config_file_path)
             except Exception as e:
-                err_msg = textwrap.dedent(f"""\
-                    [ERROR] Configuration file {config_file_path} is invalid:
-
-                    {type(e).__name__} - {str(e)}
-
-                    Configuration file should have the following content:
-
-                    [jira.server]
-                    hostname = "<your jira server url>"
-                    pat_token = "<your jira pat token>"
-
-                    and should be stored in one of the following directories:
-                    {', '.join(possible_paths)}\
-                """)
+                err_msg = INVALID_CONFIG_MSG.format(
+                    path=config_file_path,
+                    error_type=type(e).__name__,
+                    error=e,
+                    paths=", ".join(possible_paths),
+                )
                 print(err_msg)
                 sys.exit(1)
             else:
                 return config
     else:
-        err_msg = textwrap.dedent(f"""\
-            [ERROR] Cannot find configuration file 'joft.config.toml'.
-
-            Create the file with the following content:
-
-            [jira.server]
-            hostname = "<your jira server url>"
-            pat_token = "<your jira pat token>"
-
-            in one of the following directories:
-            {', '.join(possible_paths)}\
-        """)
+        err_msg = MISSING_CONFIG_MSG.format(
+            file_name=CONFIG_FILE_NAME, paths=", ".join(possible_paths)
+        )
 
         print(err_msg)
         sys.exit(1)
@@ -0,0 +1,18 @@
+import unittest.mock
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def reference_issue() -> unittest.mock.Mock:
+    """Mock of an issue which is referenced by the actions. The mock has only the
+    attributes of a jira issue and it is shared by the tests of a module, so the tests
+    can only read it."""
+
+    issue = unittest.mock.Mock(spec=["key", "id", "fields", "permalink", "update"])
+    issue.key = "TEST-123"
+    issue.fields = unittest.mock.Mock(spec=["summary", "description", "status"])
+    issue.fields.summary = "Hello from referenced issue summary"
+    issue.fields.description = "Hello from referenced issue description"
+
+    return issue
@@ -6,6 +6,32 @@ import joft.actions
 import joft.models
 
 
+INVALID_REFERENCE_CASES = [
+    pytest.param(
+        {
+            "object_id": "update-story",
+            "type": "update-ticket",
+            "reference_id": "bad_reference_id",
+            "fields": {"customAfield_12311140": "test update"},
+        },
+        joft.actions.update_ticket,
+        id="update-ticket",
+    ),
+    pytest.param(
+        {
+            "type": "transition",
+            "object_id": "close-bug",
+            "reference_id": "bad_reference_id",
+            "comment": "Closed bug by Joft",
+            "transition": "Closed",
+            "fields": {},
+        },
+        joft.actions.transition_issue,
+        id="transition",
+    ),
+]
+
+
 def test_create_ticket():
     """Testing the execution of the create-ticket action"""
     mock_jira_session = unittest.mock.MagicMock()
@@ -23,7 +49,7 @@ def test_create_ticket():
 
     new_issue = unittest.mock.MagicMock()
     new_issue.key = "TEST-456"
-    mock_jira_session.create_issue.side_effect = [new_issue]
+    mock_jira_session.create_issue.return_value = new_issue
 
     create_ticket_action = joft.models.CreateTicketAction(**create_ticket_template)
     joft.actions.create_ticket(
@@ -32,11 +58,103 @@ def test_create_ticket():
 
     # Assertions
     mock_jira_session.create_issue.assert_called_once_with(create_ticket_action.fields)
-    assert "ticket" in mock_reference_pool
-    assert mock_reference_pool["ticket"].key == "TEST-456"
+    assert mock_reference_pool["ticket"] is new_issue
+
+
+def test_update_ticket():
+    """We test the update-ticket action and it succesfull execution."""
+    update_ticket_template = {
+        "object_id": "update-story",
+        "type": "update-ticket",
+        "reference_id": "issue",
+        "fields": {"customAfield_12311140": "test update"},
+    }
+    update_ticket_action = joft.models.UpdateTicketAction(**update_ticket_template)
+
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_reference_issue = unittest.mock.MagicMock()
+    mock_reference_issue.key = "TEST-123"
+    mock_reference_pool = {"issue": mock_reference_issue}
+
+    joft.actions.update_ticket(
+        update_ticket_action, mock_jira_session, mock_reference_pool
+    )
+
+    # Assertions
+    mock_reference_issue.update.assert_called_once_with(update_ticket_action.fields)
+    assert mock_reference_pool["update-story"] is mock_reference_issue
+
+
+def test_link_issues():
+    """We test the link-issues action and it succesfull execution."""
+    link_issues_template = {
+        "type": "link-issues",
+        "object_id": "link-bug-and-epic",
+        "fields": {
+            "type": "causes",
+            "inward_issue": "TEST-123",
+            "outward_issue": "TEST-456",
+        },
+    }
+    link_issues_action = joft.models.LinkIssuesAction(**link_issues_template)
+
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_reference_pool = {}
+
+    joft.actions.link_issues(link_issues_action, mock_jira_session, mock_reference_pool)
+
+    # Assertions
+    mock_jira_session.create_issue_link.assert_called_once_with(
+        "causes", "TEST-123", "TEST-456"
+    )
+    assert "link-bug-and-epic" not in mock_reference_pool
+
+
+def test_transition_issue():
+    """We test the transition action and it succesfull execution."""
+    transition_template = {
+        "type": "transition",
+        "object_id": "close-bug",
+        "reference_id": "issue",
+        "comment": "Closed bug by Joft",
+        "transition": "Closed",
+        "fields": {},
+    }
+    transition_action = joft.models.TransitionAction(**transition_template)
+
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_reference_issue = unittest.mock.MagicMock()
+    mock_reference_issue.key = "TEST-123"
+    mock_reference_pool = {"issue": mock_reference_issue}
+
+    joft.actions.transition_issue(
+        transition_action, mock_jira_session, mock_reference_pool
+    )
+
+    # Assertions
+    mock_jira_session.transition_issue.assert_called_once_with(
+        mock_reference_issue, "Closed", {}, "Closed bug by Joft"
+    )
+    assert mock_reference_pool["close-bug"] is mock_reference_issue
+
+
+@pytest.mark.parametrize("template, handler", INVALID_REFERENCE_CASES)
+def test_action_reference_invalid_raise(template, handler):
+    """We should raise if a reference_id is invalid."""
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_reference_pool = {"bug": unittest.mock.MagicMock()}
+
+    action = joft.models.ACTION_TYPES[template["type"]](**template)
+
+    with pytest.raises(Exception) as ex:
+        handler(action, mock_jira_session, mock_reference_pool)
 
+    # Assertions
+    assert "invalid reference id" in ex.value.args[0].lower()
+    assert template["reference_id"] in ex.value.args[0].lower()
 
-def test_create_ticket_with_references():
+
+def test_create_ticket_with_references(reference_issue):
     """
     Testing the execution of the create-ticket action with references to a ticket already
     present in the reference_pool.
@@ -58,12 +176,7 @@ def test_create_ticket_with_references():
     }
     mock_reference_pool = {}
 
-    mock_reference_issue = unittest.mock.MagicMock()
-    mock_reference_issue.key = "TEST-123"
-    mock_reference_issue.fields.summary = "Hello from referenced issue summary"
-    mock_reference_issue.fields.description = "Hello from referenced issue description"
-
-    mock_reference_pool["issue"] = mock_reference_issue
+    mock_reference_pool["issue"] = reference_issue
 
     def create_issue(fields):
         new_issue = unittest.mock.MagicMock()
@@ -93,171 +206,107 @@ def test_create_ticket_with_references():
     assert description == mock_reference_pool["ticket"].fields.description
 
 
-def test_reuse_data_must_be_list():
-    create_ticket_template = {
-        "object_id": "ticket",
-        "type": "create-ticket",
-        "reuse_data": {"reference_id": "test"},
-        "fields": {
-            "project": {"key": "TEST"},
-            "issuetype": {"name": "Story"},
-            "summary": "${issue.key} - ${issue.summary}",
-            "description": "${issue.description}",
-        },
-    }
-
-    with pytest.raises(Exception) as ex:
-        joft.models.CreateTicketAction(**create_ticket_template)
-
-    # Assertions
-    assert "must be a list" in ex.value.args[0]
-
-
-def test_update_ticket():
-    """We test the update-ticket action and it succesfull execution."""
-    update_ticket_template = {
-        "object_id": "update-story",
-        "type": "update-ticket",
-        "reference_id": "issue",
-        "fields": {"customAfield_12311140": "test update"},
-    }
-    update_ticket_action = joft.models.UpdateTicketAction(**update_ticket_template)
-
+def test_create_tickets():
+    """Testing the creation of tickets of multiple create-ticket actions in one bulk
+    request."""
     mock_jira_session = unittest.mock.MagicMock()
-
-    mock_reference_pool = {}
+    create_ticket_templates = [
+        {
+            "object_id": f"ticket_{i}",
+            "type": "create-ticket",
+            "reuse_data": [{"reference_id": "issue", "fields": ["key"]}],
+            "fields": {
+                "project": {"key": "TEST"},
+                "issuetype": {"name": "Story"},
+                "summary": f"Ticket {i} for ${{issue.key}}",
+                "description": "Test the creation of tickets",
+            },
+        }
+        for i in range(3)
+    ]
 
     mock_reference_issue = unittest.mock.MagicMock()
     mock_reference_issue.key = "TEST-123"
-    mock_reference_issue.fields.summary = "Hello from referenced issue summary"
-    mock_reference_issue.fields.description = "Hello from referenced issue description"
-
-    mock_reference_pool["issue"] = mock_reference_issue
-    joft.actions.update_ticket(
-        update_ticket_action, mock_jira_session, mock_reference_pool
+    mock_reference_pool = {"issue": mock_reference_issue}
+
+    new_issues = [unittest.mock.MagicMock() for _ in create_ticket_templates]
+    mock_jira_session.create_issues.return_value = [
+        {"status": "Success", "issue": issue, "error": None} for issue in new_issues
+    ]
+
+    create_ticket_actions = [
+        joft.models.CreateTicketAction(**template)
+        for template in create_ticket_templates
+    ]
+    joft.actions.create_tickets(
+        create_ticket_actions, mock_jira_session, mock_reference_pool
     )
 
-    mock_reference_issue.update.assert_called_once_with(update_ticket_action.fields)
-
-
-def test_update_ticket_reference_invalid():
-    """We should raise if a reference_id is invalid."""
-
-    bad_reference_id = "bad_reference_id"
-
-    update_ticket_template = {
-        "object_id": "update-story",
-        "type": "update-ticket",
-        "reference_id": bad_reference_id,
-        "fields": {"customAfield_12311140": "test update"},
-    }
-    update_ticket_action = joft.models.UpdateTicketAction(**update_ticket_template)
-
-    mock_jira_session = unittest.mock.MagicMock()
-
-    mock_reference_pool = {}
-
-    with pytest.raises(Exception) as ex:
-        joft.actions.update_ticket(
-            update_ticket_action, mock_jira_session, mock_reference_pool
-        )
-
     # Assertions
-    assert "invalid reference id" in ex.value.args[0].lower()
-    assert bad_reference_id in ex.value.args[0].lower()
-
-
-def test_link_ticket():
-    """We test the link-issues action and it succesfull execution."""
-    link_issue_template = {
-        "type": "link-issues",
-        "object_id": "link-bug-and-epic",
-        "fields": {
-            "type": "causes",
-            "inward_issue": "TEST-123",
-            "outward_issue": "TEST-456",
-        },
-    }
+    mock_jira_session.create_issues.assert_called_once_with(
+        [action.fields for action in create_ticket_actions], prefetch=False
+    )
+    assert mock_jira_session.create_issue.call_count == 0
+    for i, issue in enumerate(new_issues):
+        assert mock_reference_pool[f"ticket_{i}"] is issue
+        assert create_ticket_actions[i].fields["summary"] == f"Ticket {i} for TEST-123"
 
-    link_issue_action = joft.models.LinkIssuesAction(**link_issue_template)
 
+def test_create_tickets_error_raise():
+    """We should raise if some of the tickets could not be created."""
     mock_jira_session = unittest.mock.MagicMock()
-
+    create_ticket_templates = [
+        {
+            "object_id": f"ticket_{i}",
+            "type": "create-ticket",
+            "fields": {
+                "project": {"key": "TEST"},
+                "issuetype": {"name": "Story"},
+                "summary": "Test the creation of tickets",
+            },
+        }
+        for i in range(2)
+    ]
     mock_reference_pool = {}
 
-    joft.actions.link_issues(link_issue_action, mock_jira_session, mock_reference_pool)
-
-    # Assertions
-    link_type = link_issue_template["fields"]["type"]
-    inward = link_issue_template["fields"]["inward_issue"]
-    outward = link_issue_template["fields"]["outward_issue"]
-    mock_jira_session.create_issue_link.assert_called_once_with(
-        link_type, inward, outward
-    )
-
-
-def test_transition_ticket_invalid_ref_raise():
-    """We transition a ticket to another status with comment"""
-
-    bad_reference_id = "bad_ref"
-
-    transition_issue_template = {
-        "type": "transition",
-        "object_id": "close-bug",
-        "reference_id": bad_reference_id,
-        "comment": "Closed bug by Joft",
-        "transition": "Closed",
-        "fields": {},
-    }
-
-    transition_action = joft.models.TransitionAction(**transition_issue_template)
-
-    mock_jira_session = unittest.mock.MagicMock()
-    mock_bug = unittest.mock.MagicMock()
+    new_issue = unittest.mock.MagicMock()
+    mock_jira_session.create_issues.return_value = [
+        {"status": "Success", "issue": new_issue, "error": None},
+        {"status": "Error", "issue": None, "error": {"summary": "Too long"}},
+    ]
 
-    mock_reference_pool = {
-        "bug": mock_bug,
-    }
+    create_ticket_actions = [
+        joft.models.CreateTicketAction(**template)
+        for template in create_ticket_templates
+    ]
 
     with pytest.raises(Exception) as ex:
-        joft.actions.transition_issue(
-            transition_action, mock_jira_session, mock_reference_pool
+        joft.actions.create_tickets(
+            create_ticket_actions, mock_jira_session, mock_reference_pool
         )
 
     # Assertions
-    assert "invalid reference id" in ex.value.args[0].lower()
-    assert bad_reference_id in ex.value.args[0].lower()
-
-
-def test_transition_ticket():
-    """We transition a ticket to another status with comment"""
-
-    transition_issue_template = {
-        "type": "transition",
-        "object_id": "close-bug",
-        "reference_id": "bug",
-        "comment": "Closed bug by Joft",
-        "transition": "Closed",
-        "fields": {},
-    }
+    assert "failed to create 1 ticket" in ex.value.args[0].lower()
+    assert "too long" in ex.value.args[0].lower()
+    assert mock_reference_pool["ticket_0"] is new_issue
+    assert "ticket_1" not in mock_reference_pool
 
-    transition_action = joft.models.TransitionAction(**transition_issue_template)
 
-    mock_jira_session = unittest.mock.MagicMock()
-    mock_bug = unittest.mock.MagicMock()
-
-    mock_reference_pool = {
-        "bug": mock_bug,
+def test_reuse_data_must_be_list():
+    create_ticket_template = {
+        "object_id": "ticket",
+        "type": "create-ticket",
+        "reuse_data": {"reference_id": "test"},
+        "fields": {
+            "project": {"key": "TEST"},
+            "issuetype": {"name": "Story"},
+            "summary": "${issue.key} - ${issue.summary}",
+            "description": "${issue.description}",
+        },
     }
 
-    joft.actions.transition_issue(
-        transition_action, mock_jira_session, mock_reference_pool
-    )
+    with pytest.raises(Exception) as ex:
+        joft.models.CreateTicketAction(**create_ticket_template)
 
     # Assertions
-    mock_jira_session.transition_issue.assert_called_once_with(
-        mock_bug,
-        transition_action.transition,
-        transition_action.fields,
-        transition_action.comment,
-    )
+    assert "must be a list" in ex.value.args[0]
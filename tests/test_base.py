@@ -1,16 +1,51 @@
+import threading
+import time
 import unittest
 import unittest.mock
 import typing
 
+import jira.client
 import pytest
+import yaml
 
+import joft.actions
 import joft.base
 import joft.models
+import joft.utils
+
+
+# the action is only built from the template, so the tests don't need a copy of it
+CREATE_TICKET_ALL_REFERENCES_TEMPLATE = {
+    "object_id": "ticket",
+    "type": "create-ticket",
+    "reuse_data": [
+        {
+            "reference_id": "issue",
+            "fields": [
+                "key",
+                "summary",
+                "description",
+                "id",
+                "project",
+                "link",
+                "url",
+                "permalink",
+                "components",
+                "priority",
+            ],
+        },
+    ],
+    "fields": {
+        "project": {"key": "TEST"},
+        "issuetype": {"name": "Story"},
+        "summary": "${issue.key} - ${issue.summary}",
+        "description": "${issue.description}",
+    },
+}
 
 
 def _setup_jira_template_yaml(
     duplicate_id: bool = False,
-    invalid_action: bool = False,
     no_object_ids: bool = False,
 ) -> dict[str, typing.Any]:
     """Setup function that provides different types of yaml structures"""
@@ -62,9 +97,6 @@ def _setup_jira_template_yaml(
         for action in jira_template_yaml["actions"]:
             action["object_id"] = "ticket"
 
-    if invalid_action:
-        jira_template_yaml["actions"][0]["type"] = "invalid_action"
-
     if no_object_ids:
         for action in jira_template_yaml["actions"]:
             action.pop("object_id", None)
@@ -72,12 +104,28 @@ def _setup_jira_template_yaml(
     return jira_template_yaml
 
 
-def test_validate_uniqueness_of_object_ids_raise() -> None:
+@pytest.fixture
+def jira_template_yaml(request) -> dict[str, typing.Any]:
+    """The yaml structure of a template. The flags of _setup_jira_template_yaml are
+    passed as the indirect parameter of a test."""
+
+    return _setup_jira_template_yaml(**getattr(request, "param", {}))
+
+
+@pytest.fixture(scope="module")
+def jira_template() -> joft.models.JiraTemplate:
+    """Template built from the unmodified yaml structure. The template is shared by the
+    tests of a module, so the tests can only read it."""
+
+    return joft.models.JiraTemplate(**_setup_jira_template_yaml())
+
+
+@pytest.mark.parametrize("jira_template_yaml", [{"duplicate_id": True}], indirect=True)
+def test_validate_uniqueness_of_object_ids_raise(jira_template_yaml) -> None:
     """All the object_ids need to be unique. If it is not the case we need to raise."""
 
     duplicate_id = "ticket"
 
-    jira_template_yaml = _setup_jira_template_yaml(duplicate_id=True)
     jira_template = joft.models.JiraTemplate(**jira_template_yaml)
 
     with pytest.raises(Exception) as ex:
@@ -91,44 +139,21 @@ def test_validate_uniqueness_of_object_ids_raise() -> None:
 def test_update_reference_pool() -> None:
     """Test if the reference_pool is updated with correct references"""
 
-    create_ticket_template = {
-        "object_id": "ticket",
-        "type": "create-ticket",
-        "reuse_data": [
-            {
-                "reference_id": "issue",
-                "fields": [
-                    "key",
-                    "summary",
-                    "description",
-                    "id",
-                    "project",
-                    "link",
-                    "url",
-                    "permalink",
-                    "components",
-                    "priority",
-                ],
-            },
-        ],
-        "fields": {
-            "project": {"key": "TEST"},
-            "issuetype": {"name": "Story"},
-            "summary": "${issue.key} - ${issue.summary}",
-            "description": "${issue.description}",
-        },
-    }
     mock_reference_pool = {}
 
-    mock_reference_issue = unittest.mock.MagicMock()
+    mock_comp_1 = unittest.mock.Mock(spec=["name"])
+    mock_comp_1.name = "Test 1"
+    mock_comp_2 = unittest.mock.Mock(spec=["name"])
+    mock_comp_2.name = "Test 2"
+    # the mocks have only the attributes of a jira issue and of its fields
+    mock_reference_issue = unittest.mock.Mock(spec=["key", "id", "fields", "permalink"])
     mock_reference_issue.key = "TEST-123"
     mock_reference_issue.id = "TEST-123"
+    mock_reference_issue.fields = unittest.mock.Mock(
+        spec=["summary", "description", "components", "project", "priority"]
+    )
     mock_reference_issue.fields.summary = "Hello from referenced issue summary"
     mock_reference_issue.fields.description = "Hello from referenced issue description"
-    mock_comp_1 = unittest.mock.MagicMock()
-    mock_comp_1.name = "Test 1"
-    mock_comp_2 = unittest.mock.MagicMock()
-    mock_comp_2.name = "Test 2"
     mock_reference_issue.fields.components = [mock_comp_1, mock_comp_2]
     mock_reference_issue.fields.project.key = "TEST"
     mock_reference_issue.permalink.return_value = "http://mock_url.com"
@@ -136,7 +161,9 @@ def test_update_reference_pool() -> None:
 
     mock_reference_pool["issue"] = mock_reference_issue
 
-    jira_template = joft.models.CreateTicketAction(**create_ticket_template)
+    jira_template = joft.models.CreateTicketAction(
+        **CREATE_TICKET_ALL_REFERENCES_TEMPLATE
+    )
 
     joft.base.update_reference_pool(jira_template.reference_data, mock_reference_pool)
 
@@ -150,26 +177,31 @@ def test_update_reference_pool() -> None:
     assert "issue.link" in mock_reference_pool
     assert "issue.url" in mock_reference_pool
     assert "issue.permalink" in mock_reference_pool
-    assert mock_reference_pool["issue.key"] == mock_reference_issue.key
-    assert mock_reference_pool["issue.id"] == mock_reference_issue.id
-    assert mock_reference_pool["issue.summary"] == mock_reference_issue.fields.summary
+    assert mock_reference_pool["issue.key"].value == mock_reference_issue.key
+    assert mock_reference_pool["issue.id"].value == mock_reference_issue.id
+    assert (
+        mock_reference_pool["issue.summary"].value
+        == mock_reference_issue.fields.summary
+    )
     assert (
-        mock_reference_pool["issue.description"]
+        mock_reference_pool["issue.description"].value
         == mock_reference_issue.fields.description
     )
     assert (
-        mock_reference_pool["issue.project"] == mock_reference_issue.fields.project.key
+        mock_reference_pool["issue.project"].value
+        == mock_reference_issue.fields.project.key
     )
-    assert mock_reference_pool["issue.url"] == mock_reference_issue.permalink()
-    assert mock_reference_pool["issue.link"] == mock_reference_issue.permalink()
-    assert mock_reference_pool["issue.permalink"] == mock_reference_issue.permalink()
-    assert type(mock_reference_pool["issue.components"]) is list
-    component_names = [c["name"] for c in mock_reference_pool["issue.components"]]
-    for c in mock_reference_issue.components:
-        assert c.name in component_names
+    assert mock_reference_pool["issue.url"].value == mock_reference_issue.permalink()
+    assert mock_reference_pool["issue.link"].value == mock_reference_issue.permalink()
+    assert (
+        mock_reference_pool["issue.permalink"].value == mock_reference_issue.permalink()
+    )
+    assert type(mock_reference_pool["issue.components"].value) is list
+    component_names = [c["name"] for c in mock_reference_pool["issue.components"].value]
+    assert component_names == ["Test 1", "Test 2"]
 
 
-def test_fail_update_reference_pool_when_reference_not_exist() -> None:
+def test_fail_update_reference_pool_when_reference_not_exist(reference_issue) -> None:
     """
     Test if we raise, when a reference_id is used without defining the object_id in a previous
     action .
@@ -193,12 +225,7 @@ def test_fail_update_reference_pool_when_reference_not_exist() -> None:
 
     mock_reference_pool = {}
 
-    mock_reference_issue = unittest.mock.MagicMock()
-    mock_reference_issue.key = "TEST-123"
-    mock_reference_issue.fields.summary = "Hello from referenced issue summary"
-    mock_reference_issue.fields.description = "Hello from referenced issue description"
-
-    mock_reference_pool["issue"] = mock_reference_issue
+    mock_reference_pool["issue"] = reference_issue
 
     jira_template = joft.models.CreateTicketAction(**create_ticket_template)
 
@@ -211,74 +238,270 @@ def test_fail_update_reference_pool_when_reference_not_exist() -> None:
     assert not_yet_referenced in ex.value.args[0].lower()
 
 
-def test_replace_ref() -> None:
-    """Test the the function replaces text as expected."""
-    field = "This is ${issue.priority}"
-    reference_id = "issue.priority"
-    value = "Critical"
+def test_update_reference_pool_cached() -> None:
+    """The values of a referenced object are extracted only when they are used and
+    they are reused by the following actions of the same run."""
+
+    reference_data = [
+        joft.models.ReferenceData(reference_id="issue", fields=["link", "summary"])
+    ]
+    mock_reference_issue = unittest.mock.MagicMock()
+    mock_reference_issue.permalink.return_value = "http://mock_url.com"
+    mock_reference_issue.fields.summary = "Hello from referenced issue summary"
+    mock_reference_pool = {"issue": mock_reference_issue}
+
+    joft.base.update_reference_pool(reference_data, mock_reference_pool)
+    assert mock_reference_issue.permalink.call_count == 0
+
+    assert mock_reference_pool["issue.link"].value == "http://mock_url.com"
+    assert mock_reference_pool["issue.summary"].value == (
+        "Hello from referenced issue summary"
+    )
 
-    assert joft.base.replace_ref(field, reference_id, value) == f"This is {value}"
+    mock_reference_issue.fields.summary = "Changed summary"
+    joft.base.update_reference_pool(reference_data, mock_reference_pool)
 
+    assert mock_reference_pool["issue.link"].value == "http://mock_url.com"
+    assert mock_reference_issue.permalink.call_count == 1
+    assert mock_reference_pool["issue.summary"].value == (
+        "Hello from referenced issue summary"
+    )
 
-def test_apply_reference_pool_to_payload() -> None:
-    """Test if references are replaced with actual values."""
+    # after the reference points to another object, its values are extracted
+    another_issue = unittest.mock.MagicMock()
+    another_issue.fields.summary = "Another summary"
+    mock_reference_pool["issue"] = another_issue
+    joft.base.update_reference_pool(reference_data, mock_reference_pool)
 
-    mock_reference_pool = {}
+    assert mock_reference_pool["issue.summary"].value == "Another summary"
+    assert not any(key.startswith("__") for key in mock_reference_pool)
 
-    mock_reference_pool["issue.key"] = "TEST-123"
-    mock_reference_pool["issue.summary"] = "This is a summary field."
 
-    mock_fields = {
-        "project": {"name": "${issue.key}"},
-        "issuetype": {"name": "Story"},
-        "summary": "${issue.summary}",
-    }
-    joft.base.apply_reference_pool_to_payload(mock_reference_pool, mock_fields)
+def test_extract_reference_field_loads_bulk_created_issue() -> None:
+    """A ticket created by a bulk request holds only its id and key, the rest of its
+    fields are loaded from jira when they are used for the first time."""
 
-    assert mock_fields["project"]["name"] == mock_reference_pool["issue.key"]
-    assert mock_fields["summary"] == mock_reference_pool["issue.summary"]
+    options = dict(jira.JIRA.DEFAULT_OPTIONS, server="https://jira.test")
+    issue = jira.resources.Issue(
+        options, unittest.mock.MagicMock(), raw={"id": "1", "key": "TEST-1"}
+    )
 
+    def load(key):
+        issue.fields = unittest.mock.Mock(summary=f"Summary of {key}")
 
-def test_multiple_references_in_str_field() -> None:
-    """Test if multiple references are replaced in one field."""
+    with unittest.mock.patch.object(issue, "find", side_effect=load) as mock_find:
+        assert joft.base.extract_reference_field(issue, "key") == "TEST-1"
+        assert mock_find.call_count == 0
 
-    mock_reference_pool = {}
+        assert joft.base.extract_reference_field(issue, "summary") == (
+            "Summary of TEST-1"
+        )
+        assert joft.base.extract_reference_field(issue, "summary") == (
+            "Summary of TEST-1"
+        )
+
+    mock_find.assert_called_once_with("TEST-1")
 
-    mock_reference_pool["issue.key"] = "TEST-123"
-    mock_reference_pool["issue.summary"] = "This is a summary field."
+
+def test_update_ticket_refreshes_references() -> None:
+    """The values extracted from a ticket before it was updated are extracted again
+    by the following actions."""
+
+    reference_data = [
+        joft.models.ReferenceData(reference_id="issue", fields=["summary"])
+    ]
+    mock_reference_issue = unittest.mock.MagicMock()
+    mock_reference_issue.fields.summary = "Original summary"
+    mock_reference_pool = {"issue": mock_reference_issue}
+
+    joft.base.update_reference_pool(reference_data, mock_reference_pool)
+    assert mock_reference_pool["issue.summary"].value == "Original summary"
+
+    mock_reference_issue.update.side_effect = lambda fields: setattr(
+        mock_reference_issue.fields, "summary", fields["summary"]
+    )
+    update_ticket_action = joft.models.UpdateTicketAction(
+        type="update-ticket", reference_id="issue", fields={"summary": "Updated"}
+    )
+    joft.actions.update_ticket(
+        update_ticket_action, unittest.mock.MagicMock(), mock_reference_pool
+    )
+
+    assert mock_reference_pool["issue.summary"].value == "Updated"
+
+
+@pytest.fixture(scope="module")
+def reference_pool() -> dict[str, typing.Any]:
+    """Reference pool with plain text values, which are only read by the tests."""
+
+    return {"issue.key": "TEST-123", "issue.summary": "This is a summary field."}
+
+
+@pytest.mark.parametrize(
+    "fields, expected",
+    [
+        pytest.param(
+            {"summary": "${issue.summary}"},
+            {"summary": "This is a summary field."},
+            id="single",
+        ),
+        pytest.param(
+            {"summary": "${issue.summary} with key ${issue.key}"},
+            {"summary": "This is a summary field. with key TEST-123"},
+            id="multiple",
+        ),
+        pytest.param(
+            {"project": {"name": "${issue.key}"}, "issuetype": {"name": "Story"}},
+            {"project": {"name": "TEST-123"}, "issuetype": {"name": "Story"}},
+            id="nested",
+        ),
+    ],
+)
+def test_apply_reference_pool_to_payload(reference_pool, fields, expected) -> None:
+    """Test if references, also multiple ones in one field, are replaced with actual
+    values."""
+
+    joft.base.apply_reference_pool_to_payload(reference_pool, fields)
+
+    assert fields == expected
+
+
+def test_apply_reference_pool_to_payload_nested_values() -> None:
+    """Test if references are replaced in nested values and lists are substituted
+    as a whole."""
+
+    mock_reference_pool = {
+        "issue": unittest.mock.MagicMock(),
+        "issue.key": "TEST-123",
+        "issue.priority": "Critical",
+        "issue.components": [{"name": "Test 1"}, {"name": "Test 2"}],
+    }
 
     mock_fields = {
-        "project": {"name": "${issue.key}"},
-        "issuetype": {"name": "Story"},
-        "summary": "${issue.summary} with key ${issue.key}",
+        "priority": {"name": "${issue.priority}"},
+        "labels": ["bug", "${issue.key}"],
+        "components": "${issue.components}",
+        "resolution": {"name": "Duplicate of ${issue.key}"},
+        "customfield_12311140": 5,
+        "description": "${issue} ${issue.components} ${issue.unknown}",
     }
     joft.base.apply_reference_pool_to_payload(mock_reference_pool, mock_fields)
 
-    assert mock_reference_pool["issue.summary"] in mock_fields["summary"]
-    assert mock_reference_pool["issue.key"] in mock_fields["summary"]
+    assert mock_fields == {
+        "priority": {"name": "Critical"},
+        "labels": ["bug", "TEST-123"],
+        "components": [{"name": "Test 1"}, {"name": "Test 2"}],
+        "resolution": {"name": "Duplicate of TEST-123"},
+        "customfield_12311140": 5,
+        "description": "${issue} ${issue.components} ${issue.unknown}",
+    }
 
 
-@unittest.mock.patch("logging.info")
-@unittest.mock.patch("joft.utils.load_and_parse_yaml_file")
-@unittest.mock.patch("joft.base.execute_actions_per_trigger_ticket")
-@unittest.mock.patch("joft.base.execute_actions")
+def test_apply_reference_pool_to_compiled_payload() -> None:
+    """Test if references are replaced in a payload compiled beforehand, the same
+    way as in a plain one."""
+
+    mock_reference_pool = {
+        "issue.key": "TEST-123",
+        "issue.summary": "This is a summary field.",
+        "issue.components": [{"name": "Test 1"}],
+    }
+    fields = {
+        "project": {"key": "TEST"},
+        "summary": "${issue.summary} with key ${issue.key}",
+        "labels": ["bug", "${issue.key}"],
+        "components": "${issue.components}",
+        "description": "${issue.unknown}",
+    }
+
+    compiled_fields = joft.base.compile_payload(fields)
+
+    assert compiled_fields["project"] == {"key": "TEST"}
+    assert type(compiled_fields["summary"]) is joft.base.FieldTemplate
+    assert compiled_fields["summary"] == fields["summary"]
+    assert compiled_fields["summary"].parts == (
+        "",
+        "issue.summary",
+        " with key ",
+        "issue.key",
+        "",
+    )
+
+    # without any references in the pool the compiled payload keeps the original text
+    joft.base.apply_reference_pool_to_payload({}, compiled_fields)
+    assert compiled_fields["summary"] == fields["summary"]
+
+    joft.base.apply_reference_pool_to_payload(mock_reference_pool, compiled_fields)
+    joft.base.apply_reference_pool_to_payload(mock_reference_pool, fields)
+
+    assert compiled_fields == fields
+    assert fields == {
+        "project": {"key": "TEST"},
+        "summary": "This is a summary field. with key TEST-123",
+        "labels": ["bug", "TEST-123"],
+        "components": [{"name": "Test 1"}],
+        "description": "${issue.unknown}",
+    }
+
+
+@pytest.fixture
+def execute_template_mocks():
+    """Patch everything execute_template calls besides the trigger search."""
+
+    with (
+        unittest.mock.patch.multiple(
+            "joft.base",
+            execute_actions=unittest.mock.DEFAULT,
+            execute_actions_per_trigger_ticket=unittest.mock.DEFAULT,
+        ) as mocks,
+        unittest.mock.patch("joft.utils.load_and_parse_yaml_file") as mock_load_yaml,
+        unittest.mock.patch("logging.info") as mock_log_info,
+    ):
+        mocks["load_and_parse_yaml_file"] = mock_load_yaml
+        mocks["log_info"] = mock_log_info
+        yield mocks
+
+
+@pytest.mark.parametrize(
+    "trigger_result, executed_per_trigger, log_calls",
+    [
+        pytest.param(
+            jira.client.ResultList([{"ticket_id": 1}, {"ticket_id": 2}]),
+            True,
+            [("Yaml file loaded...",)],
+            id="with_tickets",
+        ),
+        pytest.param(
+            jira.client.ResultList([]),
+            False,
+            [
+                ("Yaml file loaded...",),
+                (
+                    "No tickets found according to the provided jira query '%s'!",
+                    "test test",
+                ),
+            ],
+            id="no_tickets",
+        ),
+    ],
+)
 def test_execute_template_with_trigger(
-    mock_execute_actions,
-    mock_execute_actions_per_trigger_ticket,
-    mock_load_and_parse_yaml,
-    mock_log_info,
+    execute_template_mocks,
+    jira_template,
+    trigger_result,
+    executed_per_trigger,
+    log_calls,
 ) -> None:
     """Comprehensive test that loads the whole yaml template. Checks if the functions
-    returns correct CLI codes."""
+    returns correct CLI codes. If there are no tickets returned from a JQL query the
+    program should exit as soon as possible."""
 
     jira_template_yaml = _setup_jira_template_yaml()
-    mock_load_and_parse_yaml.return_value = jira_template_yaml
+    execute_template_mocks["load_and_parse_yaml_file"].return_value = jira_template_yaml
 
     mock_jira_session = unittest.mock.MagicMock()
-    trigger_result = [{"ticket_id": 1}, {"ticket_id": 2}]
     mock_jira_session.search_issues.return_value = trigger_result
     yaml_file_path = "./jira_template.yaml"
-    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
 
     with unittest.mock.patch("joft.models.JiraTemplate") as mock_jira_template:
         mock_jira_template.return_value = jira_template
@@ -287,58 +510,398 @@ def test_execute_template_with_trigger(
 
     assert ret_code == 0
 
-    mock_load_and_parse_yaml.assert_called_once_with(yaml_file_path)
+    execute_template_mocks["load_and_parse_yaml_file"].assert_called_once_with(
+        yaml_file_path
+    )
     mock_jira_session.search_issues.assert_called_once_with(
-        jira_template_yaml["trigger"]["jql"]
+        jira_template_yaml["trigger"]["jql"],
+        maxResults=False,
+        fields=["description", "key", "summary"],
     )
-    assert mock_execute_actions.call_count == 0
-    mock_execute_actions_per_trigger_ticket.assert_called_once_with(
-        trigger_result, jira_template, mock_jira_session
+    assert execute_template_mocks["execute_actions"].call_count == 0
+    mock_execute_actions_per_trigger_ticket = execute_template_mocks[
+        "execute_actions_per_trigger_ticket"
+    ]
+    if executed_per_trigger:
+        mock_execute_actions_per_trigger_ticket.assert_called_once_with(
+            trigger_result,
+            jira_template,
+            mock_jira_session,
+            joft.base.DEFAULT_MAX_WORKERS,
+        )
+    else:
+        assert mock_execute_actions_per_trigger_ticket.call_count == 0
+    assert [call.args for call in execute_template_mocks["log_info"].mock_calls] == (
+        log_calls
     )
-    mock_log_info.assert_called_once_with("Yaml file loaded...")
 
 
-@unittest.mock.patch("logging.info")
-@unittest.mock.patch("joft.utils.load_and_parse_yaml_file")
-@unittest.mock.patch("joft.base.execute_actions_per_trigger_ticket")
+def test_group_actions() -> None:
+    """Consecutive create-ticket actions are grouped together unless they reference
+    a ticket created in the same group."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    independent_ticket = {
+        "object_id": "independent_ticket",
+        "type": "create-ticket",
+        "fields": {
+            "project": {"key": "TEST"},
+            "issuetype": {"name": "Story"},
+            "summary": "${issue.summary}",
+        },
+    }
+    update_ticket = {
+        "type": "update-ticket",
+        "reference_id": "issue",
+        "fields": {"summary": "updated"},
+    }
+    jira_template_yaml["actions"].extend(
+        [independent_ticket, update_ticket, dict(independent_ticket, object_id="last")]
+    )
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    groups = joft.base.group_actions(jira_template.jira_actions)
+
+    assert [[action.object_id for action in group] for group in groups] == [
+        ["ticket"],
+        ["another_ticket", "independent_ticket"],
+        [None],
+        ["last"],
+    ]
+
+
+def test_group_actions_bulk_size() -> None:
+    """A group of create-ticket actions is split when it reaches the size limit of
+    the jira bulk request."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["actions"] = [
+        {
+            "object_id": f"ticket_{i}",
+            "type": "create-ticket",
+            "fields": {"project": {"key": "TEST"}, "summary": f"Ticket {i}"},
+        }
+        for i in range(joft.base.BULK_CREATE_SIZE + 1)
+    ]
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    groups = joft.base.group_actions(jira_template.jira_actions)
+
+    assert [len(group) for group in groups] == [joft.base.BULK_CREATE_SIZE, 1]
+
+
+def test_search_fields() -> None:
+    """Only the fields of the trigger tickets used by the actions are requested."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["actions"][0]["reuse_data"][0]["fields"].extend(
+        ["link", "id", "priority", "components"]
+    )
+    jira_template_yaml["actions"].append(
+        {
+            "type": "transition",
+            "reference_id": "issue",
+            "transition": "Closed",
+            "comment": "Closed by joft",
+            "fields": {},
+        }
+    )
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    assert joft.base.search_fields(jira_template) == [
+        "components",
+        "description",
+        "key",
+        "priority",
+        "status",
+        "summary",
+    ]
+
+
+def test_search_fields_trigger_alias() -> None:
+    """The fields referenced through the object_id of an action which references the
+    trigger ticket are requested as well."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["actions"] = [
+        {
+            "type": "update-ticket",
+            "object_id": "updated",
+            "reference_id": "issue",
+            "fields": {"labels": ["processed"]},
+        },
+        {
+            "type": "transition",
+            "object_id": "closed",
+            "reference_id": "updated",
+            "transition": "Closed",
+            "comment": "Closed by joft",
+            "fields": {},
+        },
+        {
+            "type": "create-ticket",
+            "reuse_data": [{"reference_id": "closed", "fields": ["summary"]}],
+            "fields": {"summary": "${closed.summary}"},
+        },
+    ]
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    assert joft.base.search_fields(jira_template) == ["key", "status", "summary"]
+
+
+def test_execute_actions_bulk_create() -> None:
+    """Independent create-ticket actions are created with one bulk request."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    for action in jira_template_yaml["actions"]:
+        action["reuse_data"] = [{"reference_id": "issue", "fields": ["key"]}]
+        action["fields"]["summary"] = "${issue.key}"
+        action["fields"]["description"] = "description"
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    mock_jira_session = unittest.mock.MagicMock()
+    new_issues = [unittest.mock.MagicMock(), unittest.mock.MagicMock()]
+    mock_jira_session.create_issues.return_value = [
+        {"status": "Success", "issue": issue, "error": None} for issue in new_issues
+    ]
+    mock_trigger_issue = unittest.mock.MagicMock()
+    mock_trigger_issue.key = "TEST-123"
+    reference_pool = {"issue": mock_trigger_issue}
+
+    joft.base.execute_actions(jira_template, mock_jira_session, reference_pool)
+
+    mock_jira_session.create_issues.assert_called_once()
+    assert mock_jira_session.create_issue.call_count == 0
+    field_list = mock_jira_session.create_issues.call_args.args[0]
+    assert [fields["summary"] for fields in field_list] == ["TEST-123", "TEST-123"]
+    assert reference_pool["ticket"] is new_issues[0]
+    assert reference_pool["another_ticket"] is new_issues[1]
+    # the template itself is left untouched
+    for action in jira_template.jira_actions:
+        assert action.fields["summary"] == "${issue.key}"
+
+
+def test_execute_actions_from_snapshot(jira_template) -> None:
+    """Every run works on its own copy of the actions restored from the snapshot, so
+    the references replaced in one run don't leak into the next one."""
+
+    actions_snapshot = joft.base.snapshot_actions(jira_template)
+    mock_jira_session = unittest.mock.MagicMock()
+
+    for key in ("TEST-1", "TEST-2"):
+        mock_trigger_issue = unittest.mock.MagicMock()
+        mock_trigger_issue.key = key
+        mock_trigger_issue.fields.summary = "summary"
+        mock_trigger_issue.fields.description = "description"
+
+        joft.base.execute_actions(
+            jira_template,
+            mock_jira_session,
+            {"issue": mock_trigger_issue},
+            actions_snapshot,
+        )
+
+        payload = mock_jira_session.create_issue.mock_calls[0].args[0]
+        assert payload["summary"] == f"{key} - summary"
+        mock_jira_session.reset_mock()
+
+    assert jira_template.jira_actions[0].fields["summary"] == (
+        "${issue.key} - ${issue.summary}"
+    )
+
+
+def test_execute_actions_dispatch() -> None:
+    """Each action is executed by the handler registered for its type. Actions of an
+    unknown type are skipped."""
+
+    jira_template = joft.models.JiraTemplate(**_setup_jira_template_yaml())
+    jira_template.jira_actions[1].type = "unknown-action"
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_create_ticket = unittest.mock.MagicMock()
+    reference_pool = {}
+
+    with unittest.mock.patch.dict(
+        joft.actions.ACTION_HANDLERS, {"create-ticket": mock_create_ticket}
+    ):
+        joft.base.execute_actions(jira_template, mock_jira_session, reference_pool)
+
+    mock_create_ticket.assert_called_once()
+    action, session, pool = mock_create_ticket.call_args.args
+    assert action.object_id == "ticket"
+    assert session is mock_jira_session
+    assert pool is reference_pool
+
+
 @unittest.mock.patch("joft.base.execute_actions")
-def test_execute_template_exit_no_tickets(
-    mock_execute_actions,
-    mock_execute_actions_per_trigger_ticket,
-    mock_load_and_parse_yaml,
-    mock_log_info,
+def test_execute_actions_per_trigger_ticket(
+    mock_execute_actions, jira_template
 ) -> None:
-    """If there are no tickets returned from a JQL query the program should exit
-    as soon as possible."""
+    """Each trigger ticket is processed with its own reference pool, which holds
+    only the ticket under the trigger object_id."""
+
+    mock_jira_session = unittest.mock.MagicMock()
+    trigger_result = [unittest.mock.MagicMock() for _ in range(10)]
+
+    joft.base.execute_actions_per_trigger_ticket(
+        trigger_result, jira_template, mock_jira_session, max_workers=3
+    )
+
+    assert mock_execute_actions.call_count == len(trigger_result)
+
+    reference_pools = [call.args[2] for call in mock_execute_actions.mock_calls]
+    processed_tickets = [pool["issue"] for pool in reference_pools]
+    assert len({id(pool) for pool in reference_pools}) == len(trigger_result)
+    assert all(len(pool) == 1 for pool in reference_pools)
+    assert sorted(map(id, processed_tickets)) == sorted(map(id, trigger_result))
+
+    # the snapshot of the actions is made only once for all the runs
+    actions_snapshots = {id(call.args[3]) for call in mock_execute_actions.mock_calls}
+    assert len(actions_snapshots) == 1
+    assert mock_execute_actions.mock_calls[0].args[3] == joft.base.snapshot_actions(
+        jira_template
+    )
+
+
+def test_execute_actions_per_trigger_ticket_concurrent_updates() -> None:
+    """The update requests of different trigger tickets are sent concurrently."""
 
     jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["actions"] = [
+        {
+            "type": "update-ticket",
+            "reference_id": "issue",
+            "fields": {"labels": ["processed"]},
+        }
+    ]
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+    mock_jira_session = unittest.mock.MagicMock()
+
+    max_workers = 3
+    # every update waits until all the workers send their update, which would never
+    # happen if the updates were sent one by one
+    barrier = threading.Barrier(max_workers, timeout=5)
+    trigger_result = [unittest.mock.MagicMock() for _ in range(max_workers * 2)]
+    for ticket in trigger_result:
+        ticket.update.side_effect = lambda fields: barrier.wait()
+
+    joft.base.execute_actions_per_trigger_ticket(
+        trigger_result, jira_template, mock_jira_session, max_workers
+    )
+
+    for ticket in trigger_result:
+        ticket.update.assert_called_once_with({"labels": ["processed"]})
 
-    mock_load_and_parse_yaml.return_value = jira_template_yaml
+
+@unittest.mock.patch("logging.error")
+@unittest.mock.patch("joft.base.execute_actions")
+def test_execute_actions_per_trigger_ticket_raise(
+    mock_execute_actions, mock_log_error, jira_template
+) -> None:
+    """An exception raised while processing a ticket must not be swallowed by the
+    thread pool. Every failed ticket is logged and the tickets still waiting in the
+    queue are not processed."""
 
     mock_jira_session = unittest.mock.MagicMock()
-    trigger_result = []
-    mock_jira_session.search_issues.return_value = trigger_result
-    yaml_file_path = "./jira_template.yaml"
-    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+    trigger_result = [unittest.mock.MagicMock(key=f"TEST-{i}") for i in range(20)]
+    # both workers fail with their first ticket, the other tickets take long enough
+    # for the failure to be noticed before the queue is emptied
+    barrier = threading.Barrier(2, timeout=5)
 
-    with unittest.mock.patch("joft.models.JiraTemplate") as mock_jira_template:
-        mock_jira_template.return_value = jira_template
+    def process_ticket(jira_template, jira_session, reference_pool, snapshot):
+        ticket = reference_pool["issue"]
+        if ticket.key in ("TEST-0", "TEST-1"):
+            barrier.wait()
+            raise Exception(f"Invalid reference id 'bad_ref' in {ticket.key}!")
+        time.sleep(0.1)
 
-        ret_code = joft.base.execute_template(yaml_file_path, mock_jira_session)
+    mock_execute_actions.side_effect = process_ticket
 
-    assert ret_code == 0
+    with pytest.raises(Exception) as ex:
+        joft.base.execute_actions_per_trigger_ticket(
+            trigger_result, jira_template, mock_jira_session, max_workers=2
+        )
+
+    assert "bad_ref" in ex.value.args[0]
+    assert mock_execute_actions.call_count < len(trigger_result)
+
+    failed_tickets = [
+        call.args[1] for call in mock_log_error.mock_calls if "failed" in call.args[0]
+    ]
+    assert failed_tickets == ["TEST-0", "TEST-1"]
+
+
+@unittest.mock.patch("concurrent.futures.wait")
+@unittest.mock.patch("joft.base.execute_actions")
+def test_execute_actions_per_trigger_ticket_interrupted(
+    mock_execute_actions, mock_wait, jira_template
+) -> None:
+    """When the wait for the tickets is interrupted, e.g. by Ctrl-C, the tickets still
+    waiting in the queue are not processed."""
+
+    mock_jira_session = unittest.mock.MagicMock()
+    trigger_result = [unittest.mock.MagicMock(key=f"TEST-{i}") for i in range(10)]
+    started = threading.Event()
+    released = threading.Event()
+
+    def process_ticket(*args):
+        started.set()
+        released.wait(timeout=5)
+
+    def interrupt(futures, return_when):
+        # the ticket being processed is released only after the queue is cancelled
+        started.wait(timeout=5)
+        threading.Timer(0.2, released.set).start()
+        raise KeyboardInterrupt
+
+    mock_execute_actions.side_effect = process_ticket
+    mock_wait.side_effect = interrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        joft.base.execute_actions_per_trigger_ticket(
+            trigger_result, jira_template, mock_jira_session, max_workers=1
+        )
+
+    assert mock_execute_actions.call_count == 1
 
-    assert mock_execute_actions_per_trigger_ticket.call_count == 0
-    assert mock_execute_actions.call_count == 0
-    assert mock_log_info.call_count == 2
-    assert mock_log_info.mock_calls[0].args[0] == "Yaml file loaded..."
-    assert jira_template.jira_search.jql in mock_log_info.mock_calls[1].args[0]
+
+def test_load_and_validate_template_cached(tmp_path) -> None:
+    """An unchanged template file is loaded only once, a changed one is loaded
+    again."""
+
+    template_file_path = tmp_path / "jira_template.yaml"
+    template_file_path.write_text(yaml.safe_dump(_setup_jira_template_yaml()))
+
+    with unittest.mock.patch(
+        "joft.utils.load_and_parse_yaml_file",
+        wraps=joft.utils.load_and_parse_yaml_file,
+    ) as mock_load_and_parse_yaml:
+        jira_template = joft.base.load_and_validate_template(str(template_file_path))
+        cached_template = joft.base.load_and_validate_template(str(template_file_path))
+
+        assert cached_template is jira_template
+        assert mock_load_and_parse_yaml.call_count == 1
+
+        template_file_path.write_text(
+            yaml.safe_dump(_setup_jira_template_yaml(no_object_ids=True))
+        )
+        changed_template = joft.base.load_and_validate_template(str(template_file_path))
+
+        assert changed_template is not jira_template
+        assert mock_load_and_parse_yaml.call_count == 2
+        assert not changed_template.jira_actions[0].object_id
+
+        # a validated template is not loaded again
+        assert joft.base.validate_template(str(template_file_path)) == 0
+        assert joft.base.load_and_validate_template(str(template_file_path)) is (
+            changed_template
+        )
+        assert mock_load_and_parse_yaml.call_count == 2
 
 
 @unittest.mock.patch("joft.base.validate_uniqueness_of_object_ids")
 @unittest.mock.patch("joft.utils.load_and_parse_yaml_file")
 def test_validate_template_success(
-    mock_load_and_parse_yaml, mock_validate_uniqueness_object_ids
+    mock_load_and_parse_yaml, mock_validate_uniqueness_object_ids, jira_template
 ) -> None:
     """Quick test to find out if all the necessary functions are called when
     validation is invoked by the user."""
@@ -347,8 +910,6 @@ def test_validate_template_success(
     jira_template_yaml = _setup_jira_template_yaml()
     mock_load_and_parse_yaml.return_value = jira_template_yaml
 
-    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
-
     with unittest.mock.patch("joft.models.JiraTemplate") as mock_jira_template:
         mock_jira_template.return_value = jira_template
         ret_code = joft.base.validate_template(yaml_file_path)
@@ -358,12 +919,93 @@ def test_validate_template_success(
     mock_validate_uniqueness_object_ids.assert_called_once_with(jira_template)
 
 
-def test_object_id_not_present() -> None:
+@pytest.mark.parametrize("jira_template_yaml", [{"no_object_ids": True}], indirect=True)
+def test_object_id_not_present(jira_template_yaml) -> None:
     """Test that Object IDs are optional, but still present in the dataclasses with
     None value"""
 
-    jira_template_yaml = _setup_jira_template_yaml(no_object_ids=True)
     jira_template = joft.models.JiraTemplate(**jira_template_yaml)
 
     for action in jira_template.jira_actions:
         assert not action.object_id
+
+
+def test_execute_actions_default_reference_pool() -> None:
+    """Runs without a reference pool don't share the references between each other."""
+
+    jira_template = joft.models.JiraTemplate(**_setup_jira_template_yaml())
+    jira_template.jira_actions = jira_template.jira_actions[:1]
+    jira_template.jira_actions[0].reference_data = []
+    mock_jira_session = unittest.mock.MagicMock()
+    pools = []
+
+    with unittest.mock.patch.dict(
+        joft.actions.ACTION_HANDLERS,
+        {"create-ticket": lambda action, session, pool: pools.append(pool)},
+    ):
+        joft.base.execute_actions(jira_template, mock_jira_session)
+        joft.base.execute_actions(jira_template, mock_jira_session)
+
+    assert len(pools) == 2
+    assert pools[0] is not pools[1]
+
+
+@unittest.mock.patch("joft.utils.load_and_parse_yaml_file")
+def test_list_issues(mock_load_and_parse_yaml) -> None:
+    """The issues are listed with their keys and browsable urls."""
+
+    mock_load_and_parse_yaml.return_value = _setup_jira_template_yaml()
+
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_jira_session.server_url = "https://issues.example.com/"
+    mock_issues = [unittest.mock.MagicMock(), unittest.mock.MagicMock()]
+    mock_issues[0].key = "TEST-1"
+    mock_issues[1].key = "TEST-2"
+    mock_jira_session.search_issues.return_value = jira.client.ResultList(mock_issues)
+
+    table = joft.base.list_issues("./jira_template.yaml", mock_jira_session)
+
+    assert "TEST-1  https://issues.example.com/browse/TEST-1" in table
+    assert "TEST-2  https://issues.example.com/browse/TEST-2" in table
+    for mock_issue in mock_issues:
+        mock_issue.permalink.assert_not_called()
+
+
+def test_search_issues_pages() -> None:
+    """All the pages of the issues are fetched by the jira client with the batch size
+    of the trigger. The client gets its own copy of the fields, as it changes them."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["trigger"]["batch_size"] = 3
+    jira_template = joft.models.JiraTemplate(**jira_template_yaml)
+
+    mock_jira_session = unittest.mock.MagicMock()
+    mock_jira_session._options = {"default_batch_size": {}}
+    mock_jira_session.search_issues.return_value = jira.client.ResultList([1, 2, 3, 4])
+    fields = ["key"]
+
+    issues = joft.base.search_issues(jira_template, mock_jira_session, fields)
+
+    assert issues == [1, 2, 3, 4]
+    assert mock_jira_session._options["default_batch_size"] == {jira.resources.Issue: 3}
+    mock_jira_session.search_issues.assert_called_once_with(
+        jira_template.jira_search.jql, maxResults=False, fields=["key"]
+    )
+    assert mock_jira_session.search_issues.call_args.kwargs["fields"] is not fields
+
+
+def test_execute_template_without_trigger(execute_template_mocks) -> None:
+    """Without a trigger the actions are executed only once."""
+
+    jira_template_yaml = _setup_jira_template_yaml()
+    jira_template_yaml["trigger"] = None
+    execute_template_mocks["load_and_parse_yaml_file"].return_value = jira_template_yaml
+    mock_execute_actions = execute_template_mocks["execute_actions"]
+    mock_jira_session = unittest.mock.MagicMock()
+
+    ret_code = joft.base.execute_template("./jira_template.yaml", mock_jira_session)
+
+    assert ret_code == 0
+    assert mock_jira_session.search_issues.call_count == 0
+    mock_execute_actions.assert_called_once()
+    assert mock_execute_actions.call_args.args[0].jira_search is None
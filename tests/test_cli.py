@@ -0,0 +1,64 @@
+import os
+import unittest.mock
+
+import click
+import pytest
+
+import joft.base
+import joft.cli
+
+
+@pytest.mark.parametrize(
+    "env, max_workers",
+    [
+        pytest.param({}, joft.base.DEFAULT_MAX_WORKERS, id="default"),
+        pytest.param({"JOFT_MAX_WORKERS": "12"}, 12, id="set"),
+    ],
+)
+def test_read_max_workers(env, max_workers) -> None:
+    """The number of workers is read from JOFT_MAX_WORKERS."""
+
+    with unittest.mock.patch.dict(os.environ, env):
+        if not env:
+            os.environ.pop("JOFT_MAX_WORKERS", None)
+
+        assert joft.cli.read_max_workers() == max_workers
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-1"])
+def test_read_max_workers_invalid_raise(value) -> None:
+    """Only a positive number of workers is accepted."""
+
+    with unittest.mock.patch.dict(os.environ, {"JOFT_MAX_WORKERS": value}):
+        with pytest.raises(click.UsageError) as ex:
+            joft.cli.read_max_workers()
+
+    assert "JOFT_MAX_WORKERS" in ex.value.message
+    assert value in ex.value.message
+
+
+@unittest.mock.patch("jira.JIRA")
+def test_create_jira_session_pool_size(mock_jira) -> None:
+    """The connection pool is made bigger when there are more workers than its
+    default size, the retries are left to the session of the jira client."""
+
+    config = {"jira": {"server": {"hostname": "https://jira.test", "pat_token": "x"}}}
+
+    jira_session = joft.cli.create_jira_session(config, max_workers=30)
+
+    mount_calls = jira_session._session.mount.mock_calls
+    assert [call.args[0] for call in mount_calls] == ["https://", "http://"]
+    adapter = mount_calls[0].args[1]
+    assert adapter._pool_maxsize == 30
+    assert adapter.max_retries.total == 0
+
+
+@unittest.mock.patch("jira.JIRA")
+def test_create_jira_session_default_pool_size(mock_jira) -> None:
+    """The default connection pool is kept when it is big enough for the workers."""
+
+    config = {"jira": {"server": {"hostname": "https://jira.test", "pat_token": "x"}}}
+
+    jira_session = joft.cli.create_jira_session(config)
+
+    jira_session._session.mount.assert_not_called()
@@ -1,3 +1,5 @@
+import dataclasses
+
 import pytest
 
 import joft.models
@@ -104,7 +106,7 @@ def test_reuse_data_must_be_list():
         ],
     }
 
-    with pytest.raises(Exception) as ex:
+    with pytest.raises(TypeError) as ex:
         joft.models.JiraTemplate(**jira_template_yaml)
 
     assert "must be a list" in ex.value.args[0].lower()
@@ -151,3 +153,18 @@ def test_execute_actions_invalid_action_raise() -> None:
 
     assert "unknown action" in ex.value.args[0].lower()
     assert bad_type in ex.value.args[0].lower()
+
+
+def test_trigger_and_reference_data_frozen() -> None:
+    """The trigger and the reference data can't be changed after they are loaded."""
+
+    trigger = joft.models.Trigger(type="jira-jql-search", object_id="issue", jql="test")
+    reference_data = joft.models.ReferenceData(reference_id="issue", fields=["key"])
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        trigger.jql = "changed"
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        reference_data.reference_id = "changed"
+
+    assert reference_data.fields == ("key",)
@@ -1,14 +1,20 @@
 import io
-import os
-import tempfile
 import unittest
 import unittest.mock
 
 import pytest
+import yaml
 
 import joft.utils
 
 
+@pytest.fixture(autouse=True)
+def clear_app_config_cache():
+    """Each test looks up the app config from scratch."""
+
+    joft.utils.load_toml_app_config.cache_clear()
+
+
 def test_load_valid_yaml() -> None:
     """Quick test to check the loading of yaml files."""
 
@@ -20,6 +26,15 @@ def test_load_valid_yaml() -> None:
     assert "apiVersion" in yaml_obj.keys()
 
 
+def test_load_yaml_with_libyaml() -> None:
+    """The yaml files are loaded with the libyaml loader when it is available."""
+
+    if yaml.__with_libyaml__:
+        assert joft.utils.YamlLoader is yaml.CSafeLoader
+    else:
+        assert joft.utils.YamlLoader is yaml.SafeLoader
+
+
 def test_load_invalid_yaml_raise() -> None:
     """The function should raise if the yaml file is invalid."""
 
@@ -29,7 +44,7 @@ def test_load_invalid_yaml_raise() -> None:
 
 @unittest.mock.patch("joft.utils.pathlib.Path.cwd")
 @unittest.mock.patch("joft.utils.platformdirs")
-def test_load_toml_app_config(mock_platformdirs, mock_cwd) -> None:
+def test_load_toml_app_config(mock_platformdirs, mock_cwd, tmp_path) -> None:
     """Test if we can find the app config file in one of the platform dirs
 
     Assert that user_config_dir is preferred over site_config_dir."""
@@ -38,20 +53,23 @@ def test_load_toml_app_config(mock_platformdirs, mock_cwd) -> None:
     pat_token = "__pat_token__"
     """
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        mock_cwd.return_value = tmpdir
-        dir_names = ["etc", ".config"]
-        for name in dir_names:
-            config_dir = os.path.join(tmpdir, name)
-            os.makedirs(config_dir)
+    mock_cwd.return_value = tmp_path
+    dir_names = ["etc", ".config"]
+    for name in dir_names:
+        config_dir = tmp_path / name
+        config_dir.mkdir()
+        (config_dir / "joft.config.toml").write_text(
+            config_file_contents.format(name=name)
+        )
 
-            with open(os.path.join(config_dir, "joft.config.toml"), "w") as fp:
-                fp.write(config_file_contents.format(name=name))
+    mock_platformdirs.user_config_dir.return_value = str(tmp_path / ".config")
+    mock_platformdirs.site_config_dir.return_value = str(tmp_path / "etc")
 
-        mock_platformdirs.user_config_dir.return_value = os.path.join(tmpdir, ".config")
-        mock_platformdirs.site_config_dir.return_value = os.path.join(tmpdir, "etc")
+    config = joft.utils.load_toml_app_config()
 
-        config = joft.utils.load_toml_app_config()
+    # the config is read only once
+    mock_platformdirs.user_config_dir.return_value = str(tmp_path / "etc")
+    assert joft.utils.load_toml_app_config() is config
 
     assert config["jira"]["server"]["hostname"] == ".config"
     assert config["jira"]["server"]["pat_token"] == "__pat_token__"
@@ -59,32 +77,49 @@ def test_load_toml_app_config(mock_platformdirs, mock_cwd) -> None:
 
 @unittest.mock.patch("joft.utils.pathlib.Path.cwd")
 @unittest.mock.patch("joft.utils.platformdirs")
-def test_load_toml_app_config_no_config_found(mock_platformdirs, mock_cwd) -> None:
+def test_load_toml_app_config_no_config_found(
+    mock_platformdirs, mock_cwd, tmp_path
+) -> None:
     """
     Test that we will end with a non-zero error code when there is no config present and
     printing a message on the stdout.
     """
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        mock_cwd.return_value = tmpdir
+    mock_cwd.return_value = tmp_path
 
-        for name in "etc", ".config":
-            config_dir = tmpdir + "/" + name
-            os.makedirs(config_dir)
+    for name in "etc", ".config":
+        (tmp_path / name).mkdir()
 
-        mock_platformdirs.user_config_dir.return_value = tmpdir + "/" + ".config"
-        mock_platformdirs.site_config_dir.return_value = ""
+    mock_platformdirs.user_config_dir.return_value = str(tmp_path / ".config")
+    mock_platformdirs.site_config_dir.return_value = ""
 
-        with unittest.mock.patch("sys.stdout", new=io.StringIO()) as mock_stdout:
-            with pytest.raises(SystemExit) as sys_exit:
-                joft.utils.load_toml_app_config()
+    with unittest.mock.patch("sys.stdout", new=io.StringIO()) as mock_stdout:
+        with pytest.raises(SystemExit) as sys_exit:
+            joft.utils.load_toml_app_config()
 
     assert "Cannot find configuration file" in mock_stdout.getvalue()
     assert sys_exit.value.args[0] == 1
 
 
 @unittest.mock.patch("joft.utils.pathlib.Path.cwd")
-def test_load_toml_app_config_invalid_config_found(mock_cwd) -> None:
+@unittest.mock.patch("joft.utils.platformdirs")
+def test_load_toml_app_config_unique_paths(mock_platformdirs, mock_cwd) -> None:
+    """Each directory is searched only once and in the order of its priority."""
+
+    mock_cwd.return_value = "/nonexistent/cwd"
+    mock_platformdirs.user_config_dir.return_value = "/nonexistent/cwd"
+    mock_platformdirs.site_config_dir.return_value = "/nonexistent/xdg:/etc"
+
+    with unittest.mock.patch("sys.stdout", new=io.StringIO()) as mock_stdout:
+        with pytest.raises(SystemExit):
+            joft.utils.load_toml_app_config()
+
+    directories = mock_stdout.getvalue().splitlines()[-1].strip()
+    assert directories == "/nonexistent/cwd, /nonexistent/xdg, /etc"
+
+
+@unittest.mock.patch("joft.utils.pathlib.Path.cwd")
+def test_load_toml_app_config_invalid_config_found(mock_cwd, tmp_path) -> None:
     """
     Test that we will end with a non-zero error code when there is an invalid
     config present and printing a message on the stdout.
@@ -94,16 +129,14 @@ def test_load_toml_app_config_invalid_config_found(mock_cwd) -> None:
     pat_token = "__pat_token__"
     """
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        mock_cwd.return_value = tmpdir
+    mock_cwd.return_value = tmp_path
 
-        config_file_path = os.path.join(tmpdir, "joft.config.toml")
-        with open(config_file_path, "w") as fp:
-            fp.write(invalid_config_file_contents)
+    config_file_path = tmp_path / "joft.config.toml"
+    config_file_path.write_text(invalid_config_file_contents)
 
-        with unittest.mock.patch("sys.stdout", new=io.StringIO()) as mock_stdout:
-            with pytest.raises(SystemExit) as sys_exit:
-                joft.utils.load_toml_app_config()
+    with unittest.mock.patch("sys.stdout", new=io.StringIO()) as mock_stdout:
+        with pytest.raises(SystemExit) as sys_exit:
+            joft.utils.load_toml_app_config()
 
     assert f"Configuration file {config_file_path} is invalid" in mock_stdout.getvalue()
     assert "KeyError - 'hostname'" in mock_stdout.getvalue()
@@ -131,3 +164,15 @@ def test_read_and_validate_config(config_file_content, raises, tmp_path) -> None
     else:
         with pytest.raises(raises):
             config = joft.utils.read_and_validate_config(config_file_path)
+
+
+def test_read_and_validate_config_missing_keys(tmp_path) -> None:
+    """All the missing keys of the jira server are reported at once."""
+
+    config_file_path = tmp_path / "joft.config.toml"
+    config_file_path.write_text("[jira.server]\nport = 443")
+
+    with pytest.raises(KeyError) as ex:
+        joft.utils.read_and_validate_config(config_file_path)
+
+    assert ex.value.args[0] == "hostname, pat_token"